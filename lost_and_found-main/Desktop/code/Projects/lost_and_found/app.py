@@ -10,26 +10,43 @@ from flask_socketio import SocketIO, emit, join_room, leave_room
 
 # Import our modules
 from models.database import init_db, get_db_connection
-from models.user import User
-from models.item import Item
+from models import unit_of_work
+from utils import assets, fanout
+from utils.maintenance import start_maintenance_thread
+from models.item import Item, FEED_PAGE_SIZE, SEARCH_MAX_RESULTS
+from models.chat_message import ChatMessage
 from routes.base_route import BaseRoute
 from routes.user_routes import UserRoute
 from routes.admin_routes import AdminRoute
 from routes.item_routes import ItemRoute
 from routes.chat_routes import ChatRoute
-from utils.otp import generate_otp, store_otp, verify_otp
+from utils.otp import generate_otp, store_otp, verify_otp, otp_issued_at
+from utils.current_user import get_current_user, invalidate_user
+from utils.chat_access import check_chat_access
+from utils.pagination import InvalidCursor
+from utils.images import image_src, image_webp
+from utils.uploads import MAX_CONTENT_LENGTH
+from utils.rate_limit import RateLimitExceeded, OTP_SEND_LIMIT, CHAT_MESSAGE_LIMIT, socket_rate_limited
+from werkzeug.exceptions import RequestEntityTooLarge
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key_here'
 
-# Initialize SocketIO
-socketio = SocketIO(app, cors_allowed_origins="*")
+# One pooled connection per request, shared by models and routes
+unit_of_work.init_app(app)
+
+# Content hashed static URLs, served with long lived cache headers
+assets.init_app(app)
+
+# Initialize SocketIO; SOCKETIO_MESSAGE_QUEUE shares rooms between worker processes
+socketio = SocketIO(app, cors_allowed_origins="*", **fanout.socketio_options())
+fanout.install(socketio)
 
 # Image upload configuration
 UPLOAD_FOLDER = 'static/uploads'
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['ALLOWED_EXTENSIONS'] = ALLOWED_EXTENSIONS
+# Werkzeug rejects larger request bodies before spooling them
+app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 
 # Create upload directory if it doesn't exist
 if not os.path.exists(UPLOAD_FOLDER):
@@ -49,14 +66,22 @@ def is_admin(user):
 def is_main_admin(user):
     return user and hasattr(user, 'role') and user.role == 'main_admin'
 
-def get_current_user():
-    if 'user_id' in session:
-        return User.get_by_id(session['user_id'])
-    return None
-
 app.jinja_env.globals.update(is_admin=is_admin)
 app.jinja_env.globals.update(is_main_admin=is_main_admin)
 app.jinja_env.globals.update(get_current_user=get_current_user)
+app.jinja_env.globals.update(image_src=image_src, image_webp=image_webp)
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    flash('The uploaded file is too large.', 'error')
+    return redirect(request.path)
+
+@app.errorhandler(RateLimitExceeded)
+def rate_limit_exceeded(e):
+    headers = {'Retry-After': str(e.retry_after)}
+    if request.path.startswith('/api/'):
+        return jsonify({'error': e.description}), 429, headers
+    return render_template('rate_limited.html', message=e.description), 429, headers
 
 # Routes
 @app.route('/')
@@ -64,17 +89,7 @@ def index():
     # Check if user is logged in
     user = None
     try:
-        user_id = session.get('user_id')
-        if user_id:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM users WHERE id = %s', (user_id,))
-            user_data = cursor.fetchone()
-            if user_data:
-                user = User(user_data['id'], user_data['username'], user_data['email'], user_data['phone'], 
-                           user_data['role'], user_data['verified'], user_data['phone_verified'])
-            cursor.close()
-            conn.close()
+        user = get_current_user()
     except Exception as e:
         print(f"Error checking user session: {e}")
         user = None
@@ -83,35 +98,49 @@ def index():
     category = request.args.get('category', '')
     location = request.args.get('location', '')
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Build query for items with filters
-    query = '''
-        SELECT li.*, u.username as poster_name 
-        FROM lost_items li 
-        JOIN users u ON li.user_id = u.id 
-        WHERE li.status = "found"
-    '''
-    params = []
+    search_query = request.args.get('q', '').strip()
     
-    if category:
-        query += ' AND li.category = %s'
-        params.append(category)
-    
-    if location:
-        query += ' AND li.location LIKE %s'
-        params.append(f'%{location}%')
-    
-    query += ' ORDER BY li.created_at DESC LIMIT 20'
-    
-    cursor.execute(query, params)
-    items = cursor.fetchall()
-    
-    cursor.close()
-    conn.close()
+    if search_query:
+        # Ranked full-text results replace the chronological feed
+        items, next_cursor = Item.search(search_query, category, location), None
+    else:
+        # Older pages are reached through the keyset cursor of the previous page
+        try:
+            items, next_cursor = Item.get_found_feed(category, location, request.args.get('cursor'))
+        except InvalidCursor:
+            items, next_cursor = Item.get_found_feed(category, location)
+    
+    return render_template('index.html', user=user, items=items, next_cursor=next_cursor,
+                           category_filter=category, location_filter=location,
+                           search_query=search_query)
+
+@app.route('/api/items')
+def item_feed():
+    """JSON feed of verified items for infinite scroll"""
+    try:
+        limit = int(request.args.get('limit', FEED_PAGE_SIZE))
+        items, next_cursor = Item.get_found_feed(request.args.get('category', ''),
+                                                 request.args.get('location', ''),
+                                                 request.args.get('cursor'), limit)
+    except (InvalidCursor, ValueError):
+        return jsonify({'error': 'Invalid cursor or limit'}), 400
+    
+    # Pre-rendered cards so the page can append them without duplicating the markup
+    html = ''.join(render_template('_item_card.html', item=item, user=get_current_user()) for item in items)
+    return jsonify({'items': [Item.to_card_json(item) for item in items], 'next_cursor': next_cursor, 'html': html})
+
+@app.route('/api/search')
+def search_items():
+    """JSON full-text search over item name, description and location"""
+    try:
+        limit = int(request.args.get('limit', SEARCH_MAX_RESULTS))
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
     
-    return render_template('index.html', user=user, items=items, category_filter=category, location_filter=location)
+    items = Item.search(request.args.get('q', ''), request.args.get('category', ''),
+                        request.args.get('location', ''), request.args.get('status', 'found'), limit)
+    html = ''.join(render_template('_item_card.html', item=item, user=get_current_user()) for item in items)
+    return jsonify({'items': [Item.to_card_json(item) for item in items], 'html': html})
 
 @app.route('/register', methods=['GET', 'POST'])
 def register():
@@ -223,6 +252,8 @@ def forgot_password():
             flash('No account found with this phone number.', 'error')
             return render_template('forgot_password.html')
         
+        OTP_SEND_LIMIT.check(formatted_phone)
+        
         # Generate and send OTP
         otp = generate_otp()
         store_otp(phone=formatted_phone, otp=otp)
@@ -246,6 +277,8 @@ def verify_forgot_password_otp():
     if request.method == 'POST':
         # Check if user wants to resend OTP
         if 'resend_otp' in request.form:
+            OTP_SEND_LIMIT.check(phone)
+            
             # Generate and resend OTP
             new_otp = generate_otp()
             store_otp(phone=phone, otp=new_otp)
@@ -302,10 +335,14 @@ def reset_forgot_password():
         # Update password in database
         conn = get_db_connection()
         cursor = conn.cursor()
+        cursor.execute('SELECT id FROM users WHERE phone = %s', (phone,))
+        changed = cursor.fetchone()
         cursor.execute('UPDATE users SET password = %s WHERE phone = %s', (hashed_password, phone))
         conn.commit()
         cursor.close()
         conn.close()
+        if changed:
+            invalidate_user(changed['id'])
         
         # Clear session data
         session.pop('forgot_password_phone', None)
@@ -332,22 +369,19 @@ def verify_phone():
         # Check if user wants to resend OTP
         if 'resend_otp' in request.form:
             # Check if enough time has passed since last OTP (2 minutes)
-            conn = get_db_connection()
-            cursor = conn.cursor()  # DictCursor is now default
-            cursor.execute("SELECT created_at FROM otp_verifications WHERE phone = %s", (phone,))
-            otp_record = cursor.fetchone()
-            cursor.close()
-            conn.close()
+            last_otp_at = otp_issued_at(phone=phone)
             
             # If there's an existing OTP record, check the cooldown period
-            if otp_record:
-                time_since_last_otp = datetime.now() - otp_record['created_at']
+            if last_otp_at:
+                time_since_last_otp = datetime.now() - last_otp_at
                 if time_since_last_otp < timedelta(minutes=2):
                     # Calculate remaining time
                     remaining_seconds = int((timedelta(minutes=2) - time_since_last_otp).total_seconds())
                     flash(f'Please wait {remaining_seconds} seconds before requesting a new OTP.', 'info')
                     return redirect(url_for('verify_phone'))
             
+            OTP_SEND_LIMIT.check(phone)
+            
             # Generate and resend OTP (no cooldown restriction or cooldown has expired)
             new_otp = generate_otp()
             store_otp(phone=phone, otp=new_otp)
@@ -370,6 +404,8 @@ def verify_phone():
             cursor = conn.cursor()
             
             # Update user's phone_verified status
+            cursor.execute('SELECT id FROM users WHERE phone = %s', (phone,))
+            changed = cursor.fetchone()
             cursor.execute('''
                 UPDATE users SET phone_verified = %s WHERE phone = %s
             ''', (1, phone))
@@ -377,6 +413,8 @@ def verify_phone():
             conn.commit()
             cursor.close()
             conn.close()
+            if changed:
+                invalidate_user(changed['id'])
             
             # Clear session data
             session.pop('pending_registration', None)
@@ -439,11 +477,16 @@ def chat(item_id):
 
 @app.route('/send_message/<int:item_id>', methods=['POST'])
 def send_message(item_id):
-    return jsonify(chat_route.send_message(item_id))
+    body, status = chat_route.send_message(item_id)
+    if status == 200:
+        # Same broadcast as the socket handler, so every worker's room buffer gets it too
+        socketio.emit('receive_message', body['message'], to=f"item_{item_id}")
+    return jsonify(body), status
 
 @app.route('/get_messages/<int:item_id>')
 def get_messages(item_id):
-    return jsonify(chat_route.get_messages(item_id))
+    body, status = chat_route.get_messages(item_id)
+    return jsonify(body), status
 
 @app.route('/monitor_chats')
 def monitor_chats():
@@ -480,7 +523,9 @@ def remove_user(user_id):
 
 @app.route('/admin/remove_item/<int:item_id>', methods=['POST'])
 def remove_item(item_id):
-    return admin_route.remove_item(item_id)
+    response = admin_route.remove_item(item_id)
+    chat_route.forget_room(item_id)
+    return response
 
 @app.route('/admin/pending_email_changes')
 def admin_pending_email_changes():
@@ -553,6 +598,8 @@ def approve_email_change(change_id):
                       (change_id,))
         
         conn.commit()
+        # Only once committed, or a concurrent request could cache the old row again
+        invalidate_user(pending_change['user_id'])
         flash('Email change approved successfully!', 'success')
     else:
         flash('Invalid request.', 'error')
@@ -604,6 +651,8 @@ def approve_phone_change(change_id):
                       (change_id,))
         
         conn.commit()
+        # Only once committed, or a concurrent request could cache the old row again
+        invalidate_user(pending_change['user_id'])
         flash('Phone change approved successfully!', 'success')
     else:
         flash('Invalid request.', 'error')
@@ -635,8 +684,18 @@ def reject_phone_change(change_id):
 # SocketIO event handlers
 @socketio.on('join')
 def on_join(data):
-    item_id = data['item_id']
-    user_id = data['user_id']
+    user_id = session.get('user_id')
+    try:
+        item_id = int(data['item_id'])
+    except (KeyError, TypeError, ValueError):
+        emit('error', {'msg': 'Invalid chat room.'})
+        return
+    
+    # Checked once here; send_message reuses the answer cached in the socket session
+    if not user_id or not check_chat_access(item_id, user_id, chat_route.can_chat):
+        emit('error', {'msg': 'Access denied. You must be either the owner or claimer of this item to chat.'})
+        return
+    
     room = f"item_{item_id}"
     join_room(room)
     # Emit a welcome message to the user
@@ -644,71 +703,45 @@ def on_join(data):
 
 @socketio.on('leave')
 def on_leave(data):
-    item_id = data['item_id']
-    user_id = data['user_id']
+    try:
+        item_id = int(data['item_id'])
+    except (KeyError, TypeError, ValueError):
+        return
     room = f"item_{item_id}"
     leave_room(room)
     # Emit a leave message to the user
     emit('status', {'msg': f'You have left the room for item {item_id}'})
 
 @socketio.on('send_message')
+@socket_rate_limited(CHAT_MESSAGE_LIMIT)
 def handle_send_message(data):
-    item_id = data['item_id']
-    user_id = data['user_id']
-    message = data['message']
-    username = data['username']
+    # Sender and username come from the session, never from the client
+    user = get_current_user()
+    if not user:
+        emit('error', {'msg': 'Please log in to chat.'})
+        return
     
-    if not message.strip():
+    try:
+        item_id = int(data['item_id'])
+    except (KeyError, TypeError, ValueError):
+        emit('error', {'msg': 'Invalid chat room.'})
         return
+    message = str(data.get('message', '')).strip()
     
-    # Save message to database
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    if not message:
+        return
     
-    try:
-        # Verify user can send message to this item
-        cursor.execute('''
-            SELECT user_id, claimed_by FROM lost_items 
-            WHERE id = %s AND (user_id = %s OR claimed_by = %s)
-        ''', (item_id, user_id, user_id))
-        item = cursor.fetchone()
-        
-        if not item:
-            emit('error', {'msg': 'Access denied. You must be either the owner or claimer of this item to chat.'})
-            return
-        
-        # Insert message
-        cursor.execute('''
-            INSERT INTO chat_messages (item_id, sender_id, message)
-            VALUES (%s, %s, %s)
-        ''', (item_id, user_id, message))
-        conn.commit()
-        
-        # Get the inserted message with username
-        cursor.execute('''
-            SELECT cm.*, u.username 
-            FROM chat_messages cm
-            JOIN users u ON cm.sender_id = u.id
-            WHERE cm.id = %s
-        ''', (cursor.lastrowid,))
-        new_message = cursor.fetchone()
-        
-        # Broadcast message to room
-        room = f"item_{item_id}"
-        emit('receive_message', {
-            'id': new_message['id'],
-            'sender_id': new_message['sender_id'],
-            'username': new_message['username'],
-            'message': new_message['message'],
-            'timestamp': new_message['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
-        }, room=room)
-        
-    except Exception as e:
-        emit('error', {'msg': f'Error sending message: {str(e)}'})
-    finally:
-        cursor.close()
-        conn.close()
+    # Verify user can send message to this item (cached since join)
+    if not check_chat_access(item_id, user.id, chat_route.can_chat):
+        emit('error', {'msg': 'Access denied. You must be either the owner or claimer of this item to chat.'})
+        return
+    
+    # Broadcast right away; the message is written to the database in the next batch
+    new_message = chat_route.post_message(item_id, user, message)
+    emit('receive_message', ChatMessage.to_json(new_message), room=f"item_{item_id}")
 
 if __name__ == '__main__':
     init_db()
+    # Purge expired OTPs / old change requests when MAINTENANCE_INTERVAL is set
+    start_maintenance_thread()
     socketio.run(app, debug=True)
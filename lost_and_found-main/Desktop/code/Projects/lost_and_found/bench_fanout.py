@@ -0,0 +1,102 @@
+"""
+Benchmark Socket.IO fan-out through the bundled broker.
+
+Starts a broker in this process and N worker processes. Each worker
+publishes its share of the messages, like app workers emitting chat messages,
+and receives every message from every worker, like app workers delivering to
+their own clients. Reports published messages/s, delivered frames/s and
+delivery latency.
+
+Usage:
+    python bench_fanout.py [workers] [messages]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+import multiprocessing
+from utils.fanout import FanoutClient, start_broker_thread
+
+
+def worker(path, worker_id, workers, messages, barrier, results):
+    client = FanoutClient(path, channel='bench')
+    frames = client.listen()
+    expected = messages - messages % workers  # every worker publishes the same share
+    share = expected // workers
+
+    # Make sure this worker's subscription is live before anyone publishes
+    ping = {'ping': worker_id}
+    stop_pinging = threading.Event()
+
+    def keep_pinging():
+        while not stop_pinging.is_set():
+            client.publish(ping)
+            stop_pinging.wait(0.05)
+
+    threading.Thread(target=keep_pinging, daemon=True).start()
+    for data in frames:
+        if data == ping:
+            break
+    stop_pinging.set()
+    barrier.wait()
+
+    def publish():
+        for seq in range(share):
+            client.publish({'worker': worker_id, 'seq': seq, 'sent': time.time()})
+
+    started = time.time()
+    threading.Thread(target=publish, daemon=True).start()
+
+    received = 0
+    latencies = []
+    for data in frames:
+        if 'seq' not in data:
+            continue  # late pings from other workers
+        received += 1
+        latencies.append(time.time() - data['sent'])
+        if received == expected:
+            break
+    results.put((worker_id, received, time.time() - started, latencies))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main(argv):
+    workers = int(argv[1]) if len(argv) > 1 else 4
+    messages = int(argv[2]) if len(argv) > 2 else 20000
+
+    path = os.path.join(tempfile.mkdtemp(), 'fanout.sock')
+    broker = start_broker_thread(path)
+
+    barrier = multiprocessing.Barrier(workers)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker, args=(path, i, workers, messages, barrier, results))
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    broker.shutdown()
+    broker.server_close()
+
+    published = messages - messages % workers
+    elapsed = max(report[2] for report in reports)
+    delivered = sum(report[1] for report in reports)
+    latencies = [latency for report in reports for latency in report[3]]
+    print(f"{workers} worker(s), {published} message(s) published, {delivered} frame(s) delivered")
+    print(f"Elapsed:   {elapsed:.2f}s")
+    print(f"Published: {published / elapsed:,.0f} messages/s")
+    print(f"Delivered: {delivered / elapsed:,.0f} frames/s")
+    print(f"Latency:   p50 {percentile(latencies, 0.5) * 1000:.1f}ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.1f}ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
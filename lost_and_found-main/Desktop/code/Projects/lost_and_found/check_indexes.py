@@ -0,0 +1,101 @@
+"""
+Check that the hot query paths are served by an index.
+
+Runs EXPLAIN for each query below and fails if MySQL would scan the whole
+table (access type ALL) or if the index added for it is not even a candidate.
+Run it against a database with realistic data: on a nearly empty table the
+optimizer may legitimately prefer a full scan.
+
+Usage:
+    python check_indexes.py
+"""
+
+import sys
+from models.database import get_db_connection
+
+# (description, table alias or name as shown by EXPLAIN, expected index, query, params)
+HOT_QUERIES = [
+    ('home page feed', 'li', 'idx_items_status_created', '''
+        SELECT li.*, u.username as poster_name FROM lost_items li JOIN users u ON li.user_id = u.id
+        WHERE li.status = "found" ORDER BY li.created_at DESC, li.id DESC LIMIT 21
+    ''', ()),
+    ('home page feed by category', 'li', 'idx_items_status_category_created', '''
+        SELECT li.*, u.username as poster_name FROM lost_items li JOIN users u ON li.user_id = u.id
+        WHERE li.status = "found" AND li.category = %s ORDER BY li.created_at DESC, li.id DESC LIMIT 21
+    ''', ('electronics',)),
+    ('dashboard my items', 'lost_items', 'idx_items_user_created', '''
+        SELECT * FROM lost_items WHERE user_id = %s ORDER BY created_at DESC
+    ''', (1,)),
+    ('dashboard claimed items', 'li', 'idx_items_claimed_by_claimed_at', '''
+        SELECT li.*, u.username as poster_name FROM lost_items li JOIN users u ON li.user_id = u.id
+        WHERE li.claimed_by = %s ORDER BY li.claimed_at DESC
+    ''', (1,)),
+    ('dashboard unverified items', 'li', 'idx_items_status_created', '''
+        SELECT li.id, li.item_name, u.username as poster_name FROM lost_items li
+        JOIN users u ON li.user_id = u.id WHERE li.status = "lost"
+    ''', ()),
+    ('dashboard unverified users', 'users', 'idx_users_verified_role', '''
+        SELECT id, username, email, phone, role, verified, phone_verified FROM users
+        WHERE verified = 0 AND role = "student"
+    ''', ()),
+    ('chat history', 'cm', 'idx_chat_item_id', '''
+        SELECT cm.*, u.username FROM chat_messages cm JOIN users u ON cm.sender_id = u.id
+        WHERE cm.item_id = %s ORDER BY cm.id DESC LIMIT 51
+    ''', (1,)),
+    ('chat history before id', 'cm', 'idx_chat_item_id', '''
+        SELECT cm.*, u.username FROM chat_messages cm JOIN users u ON cm.sender_id = u.id
+        WHERE cm.item_id = %s AND cm.id < %s ORDER BY cm.id DESC LIMIT 51
+    ''', (1, 1000)),
+    ('pending email changes', 'pec', 'idx_pending_email_approved_requested', '''
+        SELECT pec.*, u.username FROM pending_email_changes pec JOIN users u ON pec.user_id = u.id
+        WHERE pec.approved = FALSE ORDER BY pec.requested_at DESC
+    ''', ()),
+    ('pending phone changes', 'ppc', 'idx_pending_phone_approved_requested', '''
+        SELECT ppc.*, u.username FROM pending_phone_changes ppc JOIN users u ON ppc.user_id = u.id
+        WHERE ppc.approved = FALSE ORDER BY ppc.requested_at DESC
+    ''', ()),
+]
+
+
+def explain(cursor, query, params):
+    cursor.execute('EXPLAIN ' + query, params)
+    return cursor.fetchall()
+
+
+def check_query(cursor, description, table, index, query, params):
+    """Return a list of problems found in the plan for one query"""
+    problems = []
+    rows = [row for row in explain(cursor, query, params) if row['table'] == table]
+    if not rows:
+        return [f"{description}: table {table} not found in EXPLAIN output"]
+
+    for row in rows:
+        possible_keys = (row['possible_keys'] or '').split(',')
+        if index not in possible_keys:
+            problems.append(f"{description}: index {index} is not a candidate (possible_keys={row['possible_keys']})")
+        if row['type'] == 'ALL':
+            problems.append(f"{description}: full table scan on {table} (key={row['key']}, rows={row['rows']})")
+    return problems
+
+
+def main():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    problems = []
+    try:
+        for description, table, index, query, params in HOT_QUERIES:
+            query_problems = check_query(cursor, description, table, index, query, params)
+            status = 'FAIL' if query_problems else 'ok'
+            print(f"[{status}] {description}")
+            problems.extend(query_problems)
+    finally:
+        cursor.close()
+        conn.close()
+
+    for problem in problems:
+        print(f"  - {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,5 @@
 from flask import render_template, request, redirect, url_for, flash, session
-from models.user import User
+from models.user import User, DUPLICATE_MESSAGES
 from utils.otp import generate_otp, store_otp, verify_otp
 from models.database import get_db_connection
 import pymysql.cursors
@@ -32,67 +32,52 @@ def register():
         # Format phone with +91 prefix
         formatted_phone = f"+91{phone}"
         
-        # Check if user already exists
-        if User.get_by_email(email):
-            flash('Email address already registered.', 'error')
-            return render_template('register.html')
-        
-        if User.get_by_phone(formatted_phone):
-            flash('Phone number already registered.', 'error')
-            return render_template('register.html')
-        
-        if User.get_by_username(username):
-            flash('Username already taken.', 'error')
+        # Check if user already exists (one query for all three)
+        conflict = User.find_conflict(email, formatted_phone, username)
+        if conflict:
+            flash(DUPLICATE_MESSAGES[conflict], 'error')
             return render_template('register.html')
         
         # Hash password
         hashed_password = User.hash_password(password)
         
-        # Check if this is the first user (main admin)
-        all_users = User.get_all()
-        if not all_users:
-            # First user becomes main admin
-            user = User(
-                username=username,
-                email=email,
-                password=hashed_password,
-                phone=formatted_phone,
-                phone_verified=1,  # Main admin is auto phone verified
-                role='main_admin',
-                verified=1  # Main admin is auto verified
-            )
-            user.save()
+        # Regular user registration
+        user = User(
+            username=username,
+            email=email,
+            password=hashed_password,
+            phone=formatted_phone,
+            phone_verified=0,  # Students need phone verification
+            role='student',
+            verified=0  # Students need admin verification
+        )
+        
+        # The first user becomes main admin
+        is_main_admin, error = user.register()
+        if error:
+            # Another registration took the same details after the check above
+            flash(error, 'error')
+            return render_template('register.html')
+        if is_main_admin:
             flash('Registration completed successfully! You are now the main administrator.', 'success')
             return redirect(url_for('login'))
-        else:
-            # Regular user registration
-            user = User(
-                username=username,
-                email=email,
-                password=hashed_password,
-                phone=formatted_phone,
-                phone_verified=0,  # Students need phone verification
-                role='student',
-                verified=0  # Students need admin verification
-            )
-            user.save()
-            
-            # Store registration info in session for phone verification
-            session['pending_registration'] = {
-                'username': username,
-                'email': email,
-                'password': password,  # Store plain password temporarily for verification
-                'phone': formatted_phone,
-                'role': 'student'
-            }
-            
-            # Generate and send OTP
-            otp = generate_otp()
-            store_otp(phone=formatted_phone, otp=otp)
-            session['current_otp'] = otp  # Store in session for development display
-            
-            flash('Registration completed! Verification pending admin approval.', 'success')
-            return redirect(url_for('verify_phone'))
+        
+        # Store registration info in session for phone verification
+        session['pending_registration'] = {
+            'username': username,
+            'email': email,
+            'password': password,  # Store plain password temporarily for verification
+            'phone': formatted_phone,
+            'role': 'student'
+        }
+        
+        # Generate and send OTP
+        otp = generate_otp()
+        store_otp(phone=formatted_phone, otp=otp)
+        session['current_otp'] = otp  # Store in session for development display
+        
+        flash('Registration completed! Verification pending admin approval.', 'success')
+        return redirect(url_for('verify_phone'))
     
     return render_template('register.html')
 
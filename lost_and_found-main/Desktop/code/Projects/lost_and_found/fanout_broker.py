@@ -0,0 +1,30 @@
+"""
+Run the Socket.IO fan-out broker as its own process.
+
+Start it before the app workers and point every worker at it with
+SOCKETIO_MESSAGE_QUEUE=unix:///tmp/lost_and_found_fanout.sock (see
+utils/fanout.py).
+
+Usage:
+    python fanout_broker.py [socket path]
+"""
+
+import sys
+from utils.fanout import FanoutBroker, DEFAULT_SOCKET_PATH
+
+
+def main(argv):
+    path = argv[1] if len(argv) > 1 else DEFAULT_SOCKET_PATH
+    broker = FanoutBroker(path)
+    print(f"Fan-out broker listening on {path}")
+    try:
+        broker.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        broker.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,15 @@
+"""
+Delete stored images that no item or user references any more.
+
+Deleting an item already releases its image; this sweep catches the rest
+(removed users, interrupted requests).
+
+Usage:
+    python gc_images.py
+"""
+
+from utils.image_store import collect_orphans
+
+if __name__ == '__main__':
+    removed = collect_orphans()
+    print(f"Removed {removed} orphaned image(s).")
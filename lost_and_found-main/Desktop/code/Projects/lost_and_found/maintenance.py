@@ -0,0 +1,21 @@
+"""
+Purge expired OTPs and old email / phone change requests.
+
+Deletes run in small batches so the tables can be cleaned while the app is
+serving traffic. Schedule it from cron, or set MAINTENANCE_INTERVAL (seconds)
+to run the same job in a background thread of the app.
+
+Usage:
+    python maintenance.py
+"""
+
+import sys
+from utils.maintenance import run_maintenance
+
+if __name__ == '__main__':
+    counts = run_maintenance()
+    if counts is None:
+        print("Maintenance is already running in another process, skipping.")
+        sys.exit(1)
+    for table, purged in counts.items():
+        print(f"Purged {purged} row(s) from {table}.")
@@ -0,0 +1,30 @@
+"""
+Apply database schema migrations.
+
+Usage:
+    python migrate.py            # apply pending migrations
+    python migrate.py status     # list migrations and whether they are applied
+"""
+
+import sys
+from models.migrations import migrate, status
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else 'upgrade'
+
+    if command == 'upgrade':
+        applied = migrate()
+        print(f"Applied {len(applied)} migration(s).")
+    elif command == 'status':
+        for migration, applied in status():
+            state = 'applied' if applied else 'pending'
+            print(f"{migration.version:04d}_{migration.name}: {state}")
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,114 @@
+-- Baseline schema, previously created by init_db() on every boot.
+-- Written with IF NOT EXISTS so it can be applied to databases that were
+-- created by the old init_db() as well as to empty ones.
+
+CREATE TABLE IF NOT EXISTS users (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    username VARCHAR(50) NOT NULL,
+    email VARCHAR(100) NOT NULL UNIQUE,
+    password VARCHAR(255) NOT NULL,
+    phone VARCHAR(15),
+    phone_verified TINYINT(1) DEFAULT 0,
+    role ENUM('student', 'admin', 'main_admin') DEFAULT 'student',
+    verified TINYINT(1) DEFAULT 0,
+    profile_image VARCHAR(255) DEFAULT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS profile_image VARCHAR(255) DEFAULT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
+CREATE INDEX IF NOT EXISTS idx_users_phone ON users(phone);
+
+CREATE TABLE IF NOT EXISTS lost_items (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT,
+    item_name VARCHAR(100) NOT NULL,
+    description TEXT,
+    location VARCHAR(255),
+    date DATE,
+    image_url VARCHAR(255),
+    contact_methods JSON,
+    status ENUM('lost', 'found', 'claimed', 'resolved') DEFAULT 'lost',
+    claimed_by INT DEFAULT NULL,
+    claimed_at TIMESTAMP NULL DEFAULT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (claimed_by) REFERENCES users(id) ON DELETE SET NULL
+);
+
+-- Columns added over time to databases created before they existed
+ALTER TABLE lost_items
+    ADD COLUMN IF NOT EXISTS location VARCHAR(255),
+    ADD COLUMN IF NOT EXISTS date DATE,
+    ADD COLUMN IF NOT EXISTS image_url VARCHAR(255),
+    ADD COLUMN IF NOT EXISTS contact_methods JSON,
+    ADD COLUMN IF NOT EXISTS status ENUM('lost', 'found', 'claimed', 'resolved') DEFAULT 'lost',
+    ADD COLUMN IF NOT EXISTS claimed_by INT DEFAULT NULL,
+    ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP NULL DEFAULT NULL;
+
+CREATE TABLE IF NOT EXISTS claims (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    item_id INT,
+    user_id INT,
+    status ENUM('pending', 'approved', 'rejected') DEFAULT 'pending',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (item_id) REFERENCES lost_items(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS notifications (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT,
+    message TEXT,
+    is_read BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- init_db() used to drop and recreate this table to fix an older schema
+-- without the email column; patch that schema in place instead.
+CREATE TABLE IF NOT EXISTS otp_verifications (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    phone VARCHAR(15) NULL,
+    email VARCHAR(100) NULL,
+    otp VARCHAR(6),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE otp_verifications
+    ADD COLUMN IF NOT EXISTS email VARCHAR(100) NULL,
+    MODIFY phone VARCHAR(15) NULL;
+
+CREATE INDEX IF NOT EXISTS idx_otp_phone ON otp_verifications(phone);
+CREATE INDEX IF NOT EXISTS idx_otp_email ON otp_verifications(email);
+
+CREATE TABLE IF NOT EXISTS pending_email_changes (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT,
+    new_email VARCHAR(100),
+    requested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    approved BOOLEAN DEFAULT FALSE,
+    approved_at TIMESTAMP NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS pending_phone_changes (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT,
+    new_phone VARCHAR(15),
+    requested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    approved BOOLEAN DEFAULT FALSE,
+    approved_at TIMESTAMP NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    item_id INT NOT NULL,
+    sender_id INT NOT NULL,
+    message TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (item_id) REFERENCES lost_items(id) ON DELETE CASCADE,
+    FOREIGN KEY (sender_id) REFERENCES users(id) ON DELETE CASCADE
+);
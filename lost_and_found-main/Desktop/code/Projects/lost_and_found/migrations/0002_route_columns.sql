@@ -0,0 +1,11 @@
+-- Columns the routes read and write that the old init_db() never created
+
+ALTER TABLE lost_items
+    ADD COLUMN IF NOT EXISTS category VARCHAR(50) DEFAULT NULL,
+    ADD COLUMN IF NOT EXISTS claimed TINYINT(1) DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS recovered TINYINT(1) DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS satisfaction_rating TINYINT DEFAULT NULL;
+
+-- Chat queries order and display by `timestamp`
+ALTER TABLE chat_messages
+    ADD COLUMN IF NOT EXISTS timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
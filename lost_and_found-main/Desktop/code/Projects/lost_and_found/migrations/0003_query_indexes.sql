@@ -0,0 +1,26 @@
+-- Composite indexes matching the WHERE + ORDER BY shape of the hot queries.
+-- InnoDB appends the primary key to every secondary index, so the
+-- (created_at, id) keyset order of the home page feed is covered as well.
+
+-- Home page feed (app.py index / Item.get_found_feed), admin "unverified items",
+-- monitor_chats: status filter, newest first
+CREATE INDEX IF NOT EXISTS idx_items_status_created ON lost_items(status, created_at);
+
+-- Home page feed filtered by category
+CREATE INDEX IF NOT EXISTS idx_items_status_category_created ON lost_items(status, category, created_at);
+
+-- Dashboard "my items"
+CREATE INDEX IF NOT EXISTS idx_items_user_created ON lost_items(user_id, created_at);
+
+-- Dashboard "claimed items"
+CREATE INDEX IF NOT EXISTS idx_items_claimed_by_claimed_at ON lost_items(claimed_by, claimed_at);
+
+-- Chat history (routes/chat_routes.py)
+CREATE INDEX IF NOT EXISTS idx_chat_item_timestamp ON chat_messages(item_id, timestamp);
+
+-- Dashboard "unverified users" for admins
+CREATE INDEX IF NOT EXISTS idx_users_verified_role ON users(verified, role);
+
+-- Admin pending change queues
+CREATE INDEX IF NOT EXISTS idx_pending_email_approved_requested ON pending_email_changes(approved, requested_at);
+CREATE INDEX IF NOT EXISTS idx_pending_phone_approved_requested ON pending_phone_changes(approved, requested_at);
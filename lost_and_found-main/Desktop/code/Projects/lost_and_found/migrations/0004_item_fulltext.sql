@@ -0,0 +1,6 @@
+-- Full-text search over items (models/item.py Item.search, location filter).
+-- InnoDB keeps FULLTEXT indexes in sync on INSERT/UPDATE, so items posted by
+-- ItemRoute.post_item and edited by admins are searchable immediately.
+
+CREATE FULLTEXT INDEX IF NOT EXISTS ft_items_text ON lost_items(item_name, description, location);
+CREATE FULLTEXT INDEX IF NOT EXISTS ft_items_location ON lost_items(location);
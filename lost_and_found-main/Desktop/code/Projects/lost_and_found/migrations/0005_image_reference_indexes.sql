@@ -0,0 +1,3 @@
+-- Reference counting of content addressed images (utils/image_store.py)
+CREATE INDEX IF NOT EXISTS idx_items_image_url ON lost_items(image_url);
+CREATE INDEX IF NOT EXISTS idx_users_profile_image ON users(profile_image);
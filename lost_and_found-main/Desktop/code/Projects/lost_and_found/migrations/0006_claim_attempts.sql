@@ -0,0 +1,2 @@
+-- Claim attempts recorded by Item.claim(), looked up per item and user
+CREATE INDEX IF NOT EXISTS idx_claims_item_user ON claims(item_id, user_id);
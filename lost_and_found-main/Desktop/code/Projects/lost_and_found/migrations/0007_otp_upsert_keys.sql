@@ -0,0 +1,15 @@
+-- One OTP per phone / email so store_otp() can upsert (utils/otp.py).
+-- Keep only the newest row for each key before adding the unique indexes.
+
+DELETE o1 FROM otp_verifications o1
+JOIN otp_verifications o2 ON o1.phone = o2.phone AND o1.id < o2.id;
+
+DELETE o1 FROM otp_verifications o1
+JOIN otp_verifications o2 ON o1.email = o2.email AND o1.id < o2.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_otp_phone ON otp_verifications(phone);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_otp_email ON otp_verifications(email);
+
+-- Superseded by the unique indexes
+DROP INDEX IF EXISTS idx_otp_phone ON otp_verifications;
+DROP INDEX IF EXISTS idx_otp_email ON otp_verifications;
@@ -0,0 +1,2 @@
+-- Expiry lookups and purges of the SQL OTP store (utils/otp_store.py)
+CREATE INDEX IF NOT EXISTS idx_otp_created_at ON otp_verifications(created_at);
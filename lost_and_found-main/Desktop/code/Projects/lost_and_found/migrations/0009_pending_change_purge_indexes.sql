@@ -0,0 +1,3 @@
+-- Purging old approved changes (utils/maintenance.py) looks them up by approval time
+CREATE INDEX IF NOT EXISTS idx_pending_email_approved_at ON pending_email_changes(approved, approved_at);
+CREATE INDEX IF NOT EXISTS idx_pending_phone_approved_at ON pending_phone_changes(approved, approved_at);
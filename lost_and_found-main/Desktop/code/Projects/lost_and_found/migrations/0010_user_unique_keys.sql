@@ -0,0 +1,11 @@
+-- Let registration rely on the database for uniqueness (User.find_conflict /
+-- User.duplicate_field). Resolve any existing duplicate usernames or phone
+-- numbers before applying; this migration fails on them rather than guessing
+-- which account to keep.
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_users_username ON users(username);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_users_phone ON users(phone);
+
+-- Superseded by uq_users_phone; email is already unique
+DROP INDEX IF EXISTS idx_users_phone ON users;
+DROP INDEX IF EXISTS idx_users_email ON users;
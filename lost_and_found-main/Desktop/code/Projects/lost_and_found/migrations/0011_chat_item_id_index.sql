@@ -0,0 +1,5 @@
+-- Chat history is paged by message id within an item (models/chat_message.py)
+CREATE INDEX IF NOT EXISTS idx_chat_item_id ON chat_messages(item_id, id);
+
+-- Superseded: nothing orders chat by timestamp any more
+DROP INDEX IF EXISTS idx_chat_item_timestamp ON chat_messages;
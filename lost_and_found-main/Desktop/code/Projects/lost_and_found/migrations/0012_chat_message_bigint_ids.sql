@@ -0,0 +1,3 @@
+-- Chat message ids are assigned by the app (utils/chat_writer.py) as 53-bit
+-- time ordered ids, which no longer fit INT
+ALTER TABLE chat_messages MODIFY id BIGINT NOT NULL AUTO_INCREMENT;
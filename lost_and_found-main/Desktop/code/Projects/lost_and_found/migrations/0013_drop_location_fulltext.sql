@@ -0,0 +1,3 @@
+-- The location filter matches substrings with LIKE (models/item.py), in the
+-- feed and in search alike, so its own full-text index is no longer used
+DROP INDEX IF EXISTS ft_items_location ON lost_items;
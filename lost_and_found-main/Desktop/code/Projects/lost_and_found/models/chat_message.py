@@ -0,0 +1,61 @@
+from models.database import get_db_connection
+import pymysql.cursors
+
+# Messages per chat history page
+CHAT_PAGE_SIZE = 50
+CHAT_MAX_PAGE_SIZE = 200
+
+class ChatMessage:
+    @staticmethod
+    def get_page(item_id, before_id=None, after_id=None, limit=CHAT_PAGE_SIZE):
+        """Get one page of an item's chat history, oldest first.
+
+        Without ids this is the latest ``limit`` messages. ``before_id`` pages
+        back from the oldest message shown, ``after_id`` catches up on what
+        arrived after the newest one (e.g. after a reconnect). Both seek on
+        the (item_id, id) index. Returns (messages, has_more): whether older
+        messages exist, or for ``after_id`` whether more new ones are left.
+        """
+        limit = max(1, min(int(limit), CHAT_MAX_PAGE_SIZE))
+        query = '''
+            SELECT cm.*, u.username
+            FROM chat_messages cm
+            JOIN users u ON cm.sender_id = u.id
+            WHERE cm.item_id = %s
+        '''
+        params = [item_id]
+
+        if after_id is not None:
+            query += ' AND cm.id > %s ORDER BY cm.id ASC LIMIT %s'
+            params.extend([after_id, limit + 1])
+        elif before_id is not None:
+            query += ' AND cm.id < %s ORDER BY cm.id DESC LIMIT %s'
+            params.extend([before_id, limit + 1])
+        else:
+            query += ' ORDER BY cm.id DESC LIMIT %s'
+            params.append(limit + 1)
+
+        conn = get_db_connection()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        cursor.execute(query, params)
+        messages = list(cursor.fetchall())
+        cursor.close()
+        conn.close()
+
+        # One extra row was fetched to know whether there is more
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        if after_id is None:
+            messages.reverse()
+        return messages, has_more
+
+    @staticmethod
+    def to_json(message):
+        """Message row in the shape the chat page renders (same as the socket events)"""
+        return {
+            'id': message['id'],
+            'sender_id': message['sender_id'],
+            'username': message['username'],
+            'message': message['message'],
+            'timestamp': message['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
+        }
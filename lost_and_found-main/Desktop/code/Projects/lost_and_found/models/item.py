@@ -1,7 +1,22 @@
-from models.database import get_db_connection
+from models.database import get_db_connection, transaction
+from utils.pagination import encode_cursor, decode_cursor
+from utils.search import boolean_query
+from utils.image_store import release_image
 import pymysql.cursors
 from datetime import date
 
+# Items per page on the home page feed
+FEED_PAGE_SIZE = 20
+FEED_MAX_PAGE_SIZE = 100
+
+# Statuses visible to everyone (lost = waiting for admin verification)
+PUBLIC_STATUSES = ('found', 'claimed', 'resolved')
+SEARCH_MAX_RESULTS = 50
+
+# Item fields the public JSON APIs return; contact details and user ids stay
+# on the item page, which needs a login
+CARD_FIELDS = ('id', 'item_name', 'category', 'location', 'date', 'image_url', 'poster_name', 'created_at')
+
 class Item:
     def __init__(self, id=None, user_id=None, item_name=None, description=None, location=None, 
                  date=None, image_url=None, contact_methods=None, status='lost', created_at=None):
@@ -66,6 +81,150 @@ class Item:
         
         return [Item(**item_data) for item_data in items_data]
     
+    @staticmethod
+    def get_found_feed(category=None, location=None, page_cursor=None, limit=FEED_PAGE_SIZE):
+        """Get one page of verified items, newest first.
+
+        Pages are keyset paginated on (created_at, id): ``page_cursor`` is the
+        next_cursor of the previous page, so deep pages cost the same as the
+        first one. Returns (items, next_cursor); next_cursor is None on the
+        last page. Raises InvalidCursor for a malformed cursor.
+        """
+        limit = max(1, min(int(limit), FEED_MAX_PAGE_SIZE))
+        query = '''
+            SELECT li.*, u.username as poster_name 
+            FROM lost_items li 
+            JOIN users u ON li.user_id = u.id 
+            WHERE li.status = "found"
+        '''
+        params = []
+        
+        if category:
+            query += ' AND li.category = %s'
+            params.append(category)
+        
+        if location:
+            # Substring match, the same as Item.search
+            query += ' AND li.location LIKE %s'
+            params.append(f'%{location}%')
+        
+        if page_cursor:
+            created_at, item_id = decode_cursor(page_cursor)
+            query += ' AND (li.created_at < %s OR (li.created_at = %s AND li.id < %s))'
+            params.extend([created_at, created_at, item_id])
+        
+        # Fetch one extra row to know whether there is a next page
+        query += ' ORDER BY li.created_at DESC, li.id DESC LIMIT %s'
+        params.append(limit + 1)
+        
+        conn = get_db_connection()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        cursor.execute(query, params)
+        items = cursor.fetchall()
+        cursor.close()
+        conn.close()
+        
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            last = items[-1]
+            next_cursor = encode_cursor(last['created_at'], last['id'])
+        return items, next_cursor
+    
+    @staticmethod
+    def to_card_json(item):
+        """Item row reduced to what a feed card shows, safe for anonymous callers"""
+        return {field: item.get(field) for field in CARD_FIELDS}
+    
+    @staticmethod
+    def search(text, category=None, location=None, status='found', limit=SEARCH_MAX_RESULTS):
+        """Full-text search over item name, description and location.
+
+        Every word must match (as a prefix), results are ranked by relevance
+        and then recency. ``location`` narrows the results by substring like
+        the location filter always did. ``status`` is limited to the public
+        statuses. Returns a list of dicts with a ``relevance`` score.
+        """
+        match_query = boolean_query(text)
+        if not match_query or status not in PUBLIC_STATUSES:
+            return []
+        limit = max(1, min(int(limit), SEARCH_MAX_RESULTS))
+        
+        query = '''
+            SELECT li.*, u.username as poster_name,
+                   MATCH(li.item_name, li.description, li.location) AGAINST(%s IN BOOLEAN MODE) as relevance
+            FROM lost_items li 
+            JOIN users u ON li.user_id = u.id 
+            WHERE MATCH(li.item_name, li.description, li.location) AGAINST(%s IN BOOLEAN MODE)
+            AND li.status = %s
+        '''
+        params = [match_query, match_query, status]
+        
+        if category:
+            query += ' AND li.category = %s'
+            params.append(category)
+        
+        if location:
+            query += ' AND li.location LIKE %s'
+            params.append(f'%{location}%')
+        
+        query += ' ORDER BY relevance DESC, li.created_at DESC LIMIT %s'
+        params.append(limit)
+        
+        conn = get_db_connection()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        cursor.execute(query, params)
+        items = cursor.fetchall()
+        cursor.close()
+        conn.close()
+        
+        return items
+    
+    @staticmethod
+    def claim(item_id, user_id):
+        """Atomically claim an item for a user.
+
+        A single conditional UPDATE decides the winner, so concurrent claims
+        can't both succeed and no row lock is held across a read-check-write.
+        Every attempt is recorded in the claims table: the winner as
+        'approved', later competing attempts as 'pending' for admins to
+        arbitrate. Returns 'claimed', 'not_found', 'own_item' or
+        'already_claimed'.
+        """
+        with transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE lost_items 
+                SET status = 'claimed', claimed_by = %s, claimed_at = NOW() 
+                WHERE id = %s AND user_id <> %s AND status NOT IN ('claimed', 'resolved')
+            ''', (user_id, item_id, user_id))
+            
+            if cursor.rowcount == 1:
+                cursor.execute('''
+                    INSERT INTO claims (item_id, user_id, status) VALUES (%s, %s, 'approved')
+                ''', (item_id, user_id))
+                cursor.close()
+                return 'claimed'
+            
+            # Lost the race or not claimable: find out why
+            cursor.execute('SELECT user_id, status, claimed_by FROM lost_items WHERE id = %s', (item_id,))
+            item_data = cursor.fetchone()
+            if not item_data:
+                result = 'not_found'
+            elif item_data['user_id'] == user_id:
+                result = 'own_item'
+            else:
+                result = 'already_claimed'
+                if item_data['claimed_by'] != user_id:
+                    # Competing claim, kept once per user for admin review
+                    cursor.execute('''
+                        INSERT INTO claims (item_id, user_id, status)
+                        SELECT %s, %s, 'pending' FROM DUAL
+                        WHERE NOT EXISTS (SELECT 1 FROM claims WHERE item_id = %s AND user_id = %s)
+                    ''', (item_id, user_id, item_id, user_id))
+            cursor.close()
+            return result
+    
     def save(self):
         """Save item to database"""
         conn = get_db_connection()
@@ -95,19 +254,19 @@ class Item:
     def delete(self):
         """Delete item from database"""
         if self.id:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM lost_items WHERE id = %s', (self.id,))
-            conn.commit()
-            cursor.close()
-            conn.close()
+            Item.delete_by_id(self.id)
     
     @staticmethod
     def delete_by_id(item_id):
-        """Delete item by ID"""
+        """Delete item by ID, and its image once nothing else uses it"""
         conn = get_db_connection()
         cursor = conn.cursor()
+        cursor.execute('SELECT image_url FROM lost_items WHERE id = %s', (item_id,))
+        item_data = cursor.fetchone()
         cursor.execute('DELETE FROM lost_items WHERE id = %s', (item_id,))
         conn.commit()
         cursor.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
+        
+        if item_data:
+            release_image(item_data['image_url'])
\ No newline at end of file
@@ -0,0 +1,144 @@
+import os
+import re
+import pymysql
+from models.database import get_db_connection
+
+# Ordered schema migrations: migrations/NNNN_description.sql
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+# Named lock so several workers / deploy hooks can run the migrator at once
+MIGRATION_LOCK = 'lost_and_found.schema_migrations'
+MIGRATION_LOCK_TIMEOUT = 60
+
+_FILENAME_RE = re.compile(r'^(\d+)_([\w-]+)\.sql$')
+
+
+class SchemaOutOfDate(RuntimeError):
+    """Raised at boot when the database is behind the bundled migrations"""
+    pass
+
+
+class Migration:
+    """A single versioned migration file"""
+
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+
+    def statements(self):
+        """Split the file into statements; each statement ends with ';' at end of line"""
+        statements = []
+        current = []
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                stripped = line.strip()
+                if not stripped or stripped.startswith('--'):
+                    continue
+                current.append(line.rstrip())
+                if stripped.endswith(';'):
+                    statements.append('\n'.join(current).rstrip().rstrip(';'))
+                    current = []
+        if current:
+            statements.append('\n'.join(current))
+        return statements
+
+
+def discover_migrations(directory=MIGRATIONS_DIR):
+    """Return the bundled migrations ordered by version"""
+    migrations = []
+    for filename in os.listdir(directory):
+        match = _FILENAME_RE.match(filename)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2),
+                                        os.path.join(directory, filename)))
+    migrations.sort(key=lambda m: m.version)
+
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f'Duplicate migration versions in {directory}')
+    return migrations
+
+
+def get_applied_versions(cursor):
+    """Versions recorded in schema_migrations (empty if the table is missing)"""
+    try:
+        cursor.execute('SELECT version FROM schema_migrations')
+    except pymysql.err.ProgrammingError as e:
+        if e.args[0] == 1146:  # ER_NO_SUCH_TABLE
+            return set()
+        raise
+    return {row['version'] for row in cursor.fetchall()}
+
+
+def get_pending_migrations(cursor):
+    applied = get_applied_versions(cursor)
+    return [m for m in discover_migrations() if m.version not in applied]
+
+
+def migrate(verbose=True):
+    """Apply every pending migration in order and return the ones applied"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    applied = []
+    try:
+        cursor.execute('SELECT GET_LOCK(%s, %s) AS locked', (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT))
+        if not cursor.fetchone()['locked']:
+            raise RuntimeError('Timed out waiting for another migration run to finish')
+
+        try:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INT PRIMARY KEY,
+                    name VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # Re-read under the lock: another process may have just migrated
+            for migration in get_pending_migrations(cursor):
+                if verbose:
+                    print(f"Applying migration {migration.version:04d}_{migration.name}")
+                for statement in migration.statements():
+                    cursor.execute(statement)
+                cursor.execute('INSERT INTO schema_migrations (version, name) VALUES (%s, %s)',
+                               (migration.version, migration.name))
+                conn.commit()
+                applied.append(migration)
+        finally:
+            cursor.execute('SELECT RELEASE_LOCK(%s)', (MIGRATION_LOCK,))
+    finally:
+        cursor.close()
+        conn.close()
+
+    if verbose and not applied:
+        print('Database schema is up to date.')
+    return applied
+
+
+def check_schema():
+    """Cheap boot-time check that every bundled migration has been applied"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        pending = get_pending_migrations(cursor)
+    finally:
+        cursor.close()
+        conn.close()
+
+    if pending:
+        names = ', '.join(f'{m.version:04d}_{m.name}' for m in pending)
+        raise SchemaOutOfDate(f'Database schema is out of date, pending migrations: {names}. '
+                              f'Run "python migrate.py" to apply them.')
+
+
+def status():
+    """Return (migration, applied) pairs for every bundled migration"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        applied = get_applied_versions(cursor)
+    finally:
+        cursor.close()
+        conn.close()
+    return [(m, m.version in applied) for m in discover_migrations()]
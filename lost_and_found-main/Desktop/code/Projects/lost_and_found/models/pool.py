@@ -0,0 +1,242 @@
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available before the checkout timeout"""
+    pass
+
+
+class PooledConnection:
+    """Proxy around a raw connection that returns it to the pool on close().
+
+    A proxy that is garbage collected without being closed (a caller that
+    forgot close(), or an exception before it) throws its connection away,
+    so the slot is not lost for good.
+    """
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        # Must not reference self, or the proxy would never be collected
+        self._finalizer = weakref.finalize(self, pool._reclaim, raw)
+
+    def __getattr__(self, name):
+        # cursor(), commit(), rollback() etc. go straight to the raw connection
+        raw = self.__dict__.get('_raw')
+        if raw is None:
+            raise AttributeError(f"Connection already returned to the pool ({name})")
+        return getattr(raw, name)
+
+    @property
+    def closed(self):
+        return self._raw is None
+
+    def close(self):
+        """Give the connection back to the pool (safe to call more than once)"""
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._finalizer.detach()
+            self._pool._release(raw, self._created_at)
+
+    def invalidate(self):
+        """Throw the underlying connection away instead of reusing it"""
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._finalizer.detach()
+            self._pool._discard(raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self._raw is not None:
+            try:
+                self._raw.rollback()
+            except Exception:
+                self.invalidate()
+                return False
+        self.close()
+        return False
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of database connections.
+
+    Up to ``pool_size`` connections are kept idle for reuse; under load up to
+    ``max_overflow`` extra connections may be opened and are closed again when
+    returned. Once ``pool_size + max_overflow`` connections are checked out,
+    callers wait up to ``timeout`` seconds before :class:`PoolTimeout` is
+    raised. Idle connections are pinged on borrow and recycled once they have
+    been idle longer than ``max_idle`` or open longer than ``max_lifetime``.
+
+    Only ``threading`` primitives are used, so the pool is also greenlet-safe
+    when eventlet/gevent monkey patching is active.
+    """
+
+    def __init__(self, creator, pool_size=5, max_overflow=10, timeout=30,
+                 max_idle=300, max_lifetime=3600, ping_on_borrow=True):
+        self._creator = creator
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.ping_on_borrow = ping_on_borrow
+
+        self._idle = deque()  # (raw, created_at, returned_at), most recent on the right
+        self._total = 0       # open connections, idle + checked out
+        self._cond = threading.Condition()
+        self._disposed = False
+
+    def connect(self):
+        """Check out a connection, waiting for one if the pool is exhausted"""
+        deadline = time.monotonic() + self.timeout if self.timeout is not None else None
+        expired = []
+
+        try:
+            entry = self._checkout(deadline, expired)
+        finally:
+            # Closing can block on the network, so it never happens under the lock
+            for raw in expired:
+                self._close_quietly(raw)
+
+        if entry is None:
+            return self._open()
+
+        raw, created_at, _ = entry
+        if self.ping_on_borrow:
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                # Stale connection (server restart, wait_timeout...): reopen in the same slot
+                self._close_quietly(raw)
+                return self._open()
+        return PooledConnection(self, raw, created_at)
+
+    def _checkout(self, deadline, expired):
+        """Take an idle connection or reserve a slot for a new one (None)"""
+        with self._cond:
+            while True:
+                if self._disposed:
+                    raise RuntimeError('Connection pool has been disposed')
+
+                entry = self._pop_usable_idle(expired)
+                if entry is not None:
+                    return entry
+
+                if self._total < self.pool_size + self.max_overflow:
+                    # Reserve the slot now, open the connection outside the lock
+                    self._total += 1
+                    return None
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise PoolTimeout(
+                        f'No connection available within {self.timeout}s '
+                        f'(pool_size={self.pool_size}, max_overflow={self.max_overflow})'
+                    )
+                self._cond.wait(remaining)
+
+    def status(self):
+        """Snapshot of pool usage, handy for debugging and monitoring"""
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                'pool_size': self.pool_size,
+                'max_overflow': self.max_overflow,
+                'open': self._total,
+                'idle': idle,
+                'checked_out': self._total - idle,
+            }
+
+    def dispose(self):
+        """Close every idle connection; checked-out ones are closed when returned"""
+        with self._cond:
+            self._disposed = True
+            idle, self._idle = list(self._idle), deque()
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for raw, _, _ in idle:
+            self._close_quietly(raw)
+
+    def _open(self):
+        try:
+            raw = self._creator()
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, raw, time.monotonic())
+
+    def _pop_usable_idle(self, expired):
+        """Pop the most recently used idle connection (lock held).
+
+        Expired ones are dropped from the pool and added to ``expired`` for the
+        caller to close once the lock is released.
+        """
+        now = time.monotonic()
+        while self._idle:
+            raw, created_at, returned_at = self._idle.pop()
+            if self._expired(created_at, returned_at, now):
+                self._total -= 1
+                expired.append(raw)
+                continue
+            return raw, created_at, returned_at
+        return None
+
+    def _expired(self, created_at, returned_at, now):
+        if self.max_lifetime is not None and now - created_at > self.max_lifetime:
+            return True
+        if self.max_idle is not None and now - returned_at > self.max_idle:
+            return True
+        return False
+
+    def _release(self, raw, created_at):
+        # Never hand out a connection with an open transaction / stale snapshot
+        try:
+            raw.rollback()
+        except Exception:
+            self._discard(raw)
+            return
+
+        now = time.monotonic()
+        with self._cond:
+            keep = (
+                not self._disposed
+                and len(self._idle) < self.pool_size
+                and not self._expired(created_at, now, now)
+            )
+            if keep:
+                self._idle.append((raw, created_at, now))
+            else:
+                self._total -= 1
+            self._cond.notify()
+        if not keep:
+            self._close_quietly(raw)
+
+    def _discard(self, raw):
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+        self._close_quietly(raw)
+
+    def _reclaim(self, raw):
+        # Finalizer of a proxy collected without close(): its state is unknown
+        # (open transaction, unread results), so the connection is not reused
+        logger.debug('Database connection was garbage collected without close(); discarding it')
+        self._discard(raw)
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
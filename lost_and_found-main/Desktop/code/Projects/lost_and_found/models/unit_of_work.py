@@ -0,0 +1,114 @@
+from contextlib import contextmanager
+from flask import g, has_request_context, current_app
+
+
+class RequestConnection:
+    """Connection handle shared by everything that runs during one request.
+
+    close() is a no-op and commit() is deferred while a transaction() block is
+    open; the real connection goes back to the pool in teardown_request.
+    """
+
+    def __init__(self, unit_of_work):
+        self._unit_of_work = unit_of_work
+
+    def __getattr__(self, name):
+        return getattr(self._unit_of_work.raw_connection(), name)
+
+    def commit(self):
+        self._unit_of_work.commit()
+
+    def rollback(self):
+        self._unit_of_work.rollback()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class UnitOfWork:
+    """One pooled connection (and optional transaction) for the current request"""
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._conn = None
+        self._depth = 0
+
+    def raw_connection(self):
+        """Check out the request's connection on first use"""
+        if self._conn is None:
+            self._conn = self._pool.connect()
+        return self._conn
+
+    def connection(self):
+        return RequestConnection(self)
+
+    @property
+    def in_transaction(self):
+        return self._depth > 0
+
+    @contextmanager
+    def transaction(self):
+        """Group everything inside the block into a single commit"""
+        conn = self.connection()
+        self._depth += 1
+        try:
+            yield conn
+        except Exception:
+            self._depth -= 1
+            self.rollback()
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            self.commit()
+
+    def commit(self):
+        # Inside transaction() the outermost block commits
+        if self._depth == 0 and self._conn is not None:
+            self._conn.commit()
+
+    def rollback(self):
+        if self._conn is not None:
+            self._conn.rollback()
+
+    def finish(self, exc=None):
+        """Commit (or roll back on error) and return the connection to the pool"""
+        conn, self._conn = self._conn, None
+        self._depth = 0
+        if conn is None:
+            return
+        try:
+            if exc is None:
+                conn.commit()
+            else:
+                conn.rollback()
+        except Exception:
+            conn.invalidate()
+            return
+        conn.close()
+
+
+def init_app(app):
+    """Enable the request scoped unit of work for a Flask app"""
+    app.extensions['unit_of_work'] = True
+
+    @app.teardown_request
+    def _finish_unit_of_work(exc):
+        unit_of_work = g.pop('_unit_of_work', None)
+        if unit_of_work is not None:
+            unit_of_work.finish(exc)
+
+
+def get_unit_of_work(pool):
+    """Return the current request's unit of work, or None outside a request"""
+    if not has_request_context() or 'unit_of_work' not in current_app.extensions:
+        return None
+    unit_of_work = g.get('_unit_of_work')
+    if unit_of_work is None:
+        unit_of_work = g._unit_of_work = UnitOfWork(pool)
+    return unit_of_work
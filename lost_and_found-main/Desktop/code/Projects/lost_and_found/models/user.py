@@ -1,6 +1,32 @@
 from models.database import get_db_connection
+from utils.cache import TTLCache
 import pymysql.cursors
 import hashlib
+import re
+import copy
+import os
+
+# Short lived in-process cache of users by id (seconds, 0 disables it)
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 5))
+_user_cache = TTLCache(USER_CACHE_TTL)
+
+# Serializes main admin elections between concurrent first registrations
+MAIN_ADMIN_LOCK = 'lost_and_found.main_admin'
+MAIN_ADMIN_LOCK_TIMEOUT = 10
+
+# Unique indexes on users -> the field they protect
+_UNIQUE_KEYS = {'email': 'email', 'uq_users_phone': 'phone', 'uq_users_username': 'username'}
+_DUPLICATE_KEY_RE = re.compile(r"for key '([^']+)'")
+
+# Form message for each already registered field
+DUPLICATE_MESSAGES = {
+    'email': 'Email address already registered.',
+    'phone': 'Phone number already registered.',
+    'username': 'Username already taken.',
+}
+
+# Once a user exists there always is one; remembered so registration skips the probe
+_users_exist = False
 
 class User:
     def __init__(self, id=None, username=None, email=None, password=None, phone=None, 
@@ -30,6 +56,25 @@ class User:
             return User(**user_data)
         return None
     
+    @staticmethod
+    def get_cached(user_id):
+        """Get user by ID, served from the short TTL cache when possible"""
+        user = _user_cache.get(user_id)
+        if user is None:
+            user = User.get_by_id(user_id)
+            if user:
+                _user_cache.set(user_id, user)
+        # Hand out a copy so callers can't modify the cached instance
+        return copy.copy(user) if user else None
+    
+    @staticmethod
+    def invalidate_cache(user_id=None):
+        """Drop a user (or every user) from the cache"""
+        if user_id is None:
+            _user_cache.clear()
+        else:
+            _user_cache.delete(user_id)
+    
     @staticmethod
     def get_by_email(email):
         """Get user by email"""
@@ -72,6 +117,59 @@ class User:
             return User(**user_data)
         return None
     
+    @staticmethod
+    def find_conflict(email, phone, username):
+        """Which of email / phone / username is already registered (in that order), or None"""
+        conn = get_db_connection()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        # One round trip; each branch of the OR is served by its own unique index
+        cursor.execute('''
+            SELECT email, phone, username FROM users
+            WHERE email = %s OR phone = %s OR username = %s
+            LIMIT 3
+        ''', (email, phone, username))
+        rows = cursor.fetchall()
+        cursor.close()
+        conn.close()
+        
+        for field, value in (('email', email), ('phone', phone), ('username', username)):
+            if any(row[field] == value for row in rows):
+                return field
+        return None
+    
+    @staticmethod
+    def duplicate_field(error):
+        """Map a duplicate key IntegrityError from saving a user to 'email', 'phone' or 'username'"""
+        if error.args[0] != 1062:  # ER_DUP_ENTRY
+            return None
+        match = _DUPLICATE_KEY_RE.search(str(error.args[1]))
+        if match:
+            return _UNIQUE_KEYS.get(match.group(1).split('.')[-1])
+        return None
+    
+    @staticmethod
+    def duplicate_message(error):
+        """Form message for a duplicate key IntegrityError from saving a user, or None"""
+        return DUPLICATE_MESSAGES.get(User.duplicate_field(error))
+    
+    def register(self):
+        """Save a newly registered user; the first one becomes main admin.
+        
+        Returns (is_main_admin, error) where error is the form message when
+        another registration took the same email, phone or username first.
+        """
+        try:
+            # Elected under a lock, so only one concurrent first registration can win
+            if not User.any_exist() and self.save_as_main_admin():
+                return True, None
+            self.save()
+        except pymysql.err.IntegrityError as e:
+            message = User.duplicate_message(e)
+            if message is None:
+                raise
+            return False, message
+        return False, None
+    
     @staticmethod
     def hash_password(password):
         """Hash a password using SHA-256"""
@@ -102,6 +200,7 @@ class User:
         conn.commit()
         cursor.close()
         conn.close()
+        User.invalidate_cache(self.id)
     
     def is_admin(self):
         """Check if user is admin or main admin"""
@@ -111,6 +210,54 @@ class User:
         """Check if user is main admin"""
         return self.role == 'main_admin'
     
+    @staticmethod
+    def any_exist():
+        """Whether at least one user is registered (indexed probe, cached once true)"""
+        global _users_exist
+        if _users_exist:
+            return True
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT EXISTS(SELECT 1 FROM users) AS found')
+        _users_exist = bool(cursor.fetchone()['found'])
+        cursor.close()
+        conn.close()
+        return _users_exist
+    
+    def save_as_main_admin(self):
+        """Save this new user as the main admin if nobody registered yet.
+        
+        Returns False (without saving) when another registration got there
+        first; the caller then registers a regular user instead.
+        """
+        global _users_exist
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT GET_LOCK(%s, %s) AS locked', (MAIN_ADMIN_LOCK, MAIN_ADMIN_LOCK_TIMEOUT))
+        if not cursor.fetchone()['locked']:
+            cursor.close()
+            conn.close()
+            raise RuntimeError('Timed out waiting for another registration to finish')
+        
+        try:
+            # End any open snapshot so the check sees a user committed by the previous lock holder
+            conn.commit()
+            cursor.execute('SELECT EXISTS(SELECT 1 FROM users) AS found')
+            if cursor.fetchone()['found']:
+                _users_exist = True
+                return False
+            
+            self.role = 'main_admin'
+            self.verified = 1  # Main admin is auto verified
+            self.phone_verified = 1  # Main admin is auto phone verified
+            self.save()
+            _users_exist = True
+            return True
+        finally:
+            cursor.execute('SELECT RELEASE_LOCK(%s)', (MAIN_ADMIN_LOCK,))
+            cursor.close()
+            conn.close()
+    
     @staticmethod
     def get_all():
         """Get all users"""
@@ -131,4 +278,9 @@ class User:
         cursor.execute('DELETE FROM users WHERE id = %s', (user_id,))
         conn.commit()
         cursor.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
+        User.invalidate_cache(user_id)
+        
+        # The last user may be gone; probe again on the next registration
+        global _users_exist
+        _users_exist = False
\ No newline at end of file
@@ -3,6 +3,8 @@ from routes.base_route import BaseRoute
 from models.user import User
 from models.item import Item
 from models.database import get_db_connection
+from utils.image_store import release_image
+from utils.chat_access import invalidate_item_access, invalidate_user_access
 
 class AdminRoute(BaseRoute):
     """Admin related routes"""
@@ -22,6 +24,7 @@ class AdminRoute(BaseRoute):
         conn.commit()
         cursor.close()
         conn.close()
+        self.invalidate_user(user_id)
         
         flash('User verified successfully!', 'success')
         return redirect(url_for('dashboard'))
@@ -38,6 +41,8 @@ class AdminRoute(BaseRoute):
         conn.commit()
         cursor.close()
         conn.close()
+        self.invalidate_user(user_id)
+        invalidate_user_access(user_id)
         
         flash('User rejected and removed successfully!', 'success')
         return redirect(url_for('dashboard'))
@@ -87,6 +92,7 @@ class AdminRoute(BaseRoute):
         conn.commit()
         cursor.close()
         conn.close()
+        self.invalidate_user(user_id)
         
         flash('User promoted to admin successfully!', 'success')
         return redirect(url_for('dashboard'))
@@ -104,6 +110,8 @@ class AdminRoute(BaseRoute):
         conn.commit()
         cursor.close()
         conn.close()
+        self.invalidate_user(user_id)
+        invalidate_user_access(user_id)
         
         flash('User removed successfully!', 'success')
         return redirect(url_for('dashboard'))
@@ -121,6 +129,7 @@ class AdminRoute(BaseRoute):
         conn.commit()
         cursor.close()
         conn.close()
+        self.invalidate_user(user_id)
         
         flash('Admin demoted to student successfully!', 'success')
         return redirect(url_for('dashboard'))
@@ -135,6 +144,9 @@ class AdminRoute(BaseRoute):
         conn = get_db_connection()
         cursor = conn.cursor()
         
+        cursor.execute('SELECT image_url FROM lost_items WHERE id = %s', (item_id,))
+        item = cursor.fetchone()
+        
         # First delete associated chat messages to avoid foreign key constraint violation
         cursor.execute('DELETE FROM chat_messages WHERE item_id = %s', (item_id,))
         
@@ -143,6 +155,11 @@ class AdminRoute(BaseRoute):
         conn.commit()
         cursor.close()
         conn.close()
+        invalidate_item_access(item_id)
+        
+        # Delete the image file if this item was its last user
+        if item:
+            release_image(item['image_url'])
         
         flash('Item removed successfully!', 'success')
         return redirect(url_for('dashboard'))
\ No newline at end of file
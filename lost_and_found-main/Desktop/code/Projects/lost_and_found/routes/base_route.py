@@ -1,6 +1,7 @@
 from flask import render_template, request, redirect, url_for, flash, session
 from models.user import User
 from models.database import get_db_connection
+from utils.current_user import get_current_user, invalidate_user
 
 class BaseRoute:
     """Base class for all routes"""
@@ -9,10 +10,12 @@ class BaseRoute:
         pass
     
     def get_current_user(self):
-        """Get current logged in user"""
-        if 'user_id' in session:
-            return User.get_by_id(session['user_id'])
-        return None
+        """Get current logged in user (memoized for the request)"""
+        return get_current_user()
+    
+    def invalidate_user(self, user_id=None):
+        """Drop cached copies of a user after it was modified"""
+        invalidate_user(user_id)
     
     def is_admin(self, user):
         """Check if user is admin or main admin"""
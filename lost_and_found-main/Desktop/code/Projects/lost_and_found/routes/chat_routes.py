@@ -2,19 +2,174 @@ from flask import render_template, request, redirect, url_for, flash, session
 from routes.base_route import BaseRoute
 from models.user import User
 from models.item import Item
+from models.chat_message import ChatMessage, CHAT_PAGE_SIZE
+from utils.chat_writer import get_chat_writer
+from utils import fanout
 from models.database import get_db_connection
+from collections import OrderedDict, deque
+from datetime import datetime
 import json
 import threading
 import time
 
+# Recent messages kept in memory per room (one first screen of chat.html)
+CHAT_BUFFER_SIZE = CHAT_PAGE_SIZE
+# Total messages buffered across all rooms; least recently used rooms go first
+CHAT_BUFFER_MAX_MESSAGES = 20000
+# Messages of every room lately received from the fan-out. Another worker's
+# messages may not be written yet when a room is loaded from the DB; this
+# covers them as long as that worker's write-behind queue is shorter. Kept
+# per room, least recently used rooms dropped first past the total.
+CHAT_FANOUT_TAIL = 5000
+CHAT_FANOUT_ROOM_TAIL = 200
+
+class ChatRoom:
+    """Ring buffer of a room's latest messages, oldest first"""
+    
+    def __init__(self, messages, has_more):
+        self.messages = deque(messages, maxlen=CHAT_BUFFER_SIZE)
+        self.has_more = has_more or len(messages) > CHAT_BUFFER_SIZE  # older messages exist beyond the buffer
+    
+    def add(self, message):
+        """Add a message, keeping id order and skipping one already here"""
+        messages = self.messages
+        if not messages or message['id'] > messages[-1]['id']:
+            if len(messages) == messages.maxlen:
+                self.has_more = True
+            messages.append(message)
+            return
+        if any(m['id'] == message['id'] for m in messages):
+            return
+        # Another worker's message, older than the newest one here
+        merged = sorted(list(messages) + [message], key=lambda m: m['id'])
+        if len(merged) > messages.maxlen:
+            self.has_more = True
+        self.messages = deque(merged, maxlen=messages.maxlen)
+
 class ChatRoute(BaseRoute):
     """Chat related routes"""
     
     def __init__(self):
         super().__init__()
-        # In-memory storage for chat messages (in production, use a proper database)
-        self.chat_rooms = {}
+        # Hot rooms: item_id -> ChatRoom, least recently used first. Each worker
+        # process has its own, kept complete by the messages other workers
+        # post arriving through the fan-out (see utils/fanout.py).
+        self.chat_rooms = OrderedDict()
         self.chat_lock = threading.Lock()
+        self.buffered_messages = 0
+        self.fanout_tail = OrderedDict()  # item_id -> deque of messages
+        self.fanout_tail_size = 0
+        fanout.on_emit('receive_message', self._on_fanned_out_message)
+    
+    def recent_messages(self, item_id):
+        """Latest page of a room's messages as (messages, has_more), from memory when hot"""
+        with self.chat_lock:
+            room = self.chat_rooms.get(item_id)
+            if room is not None:
+                self.chat_rooms.move_to_end(item_id)
+                return list(room.messages), room.has_more
+        
+        unwritten = self._unwritten(item_id)
+        messages, has_more = ChatMessage.get_page(item_id, limit=CHAT_BUFFER_SIZE)
+        messages = self._with_unwritten(messages, unwritten, has_more)
+        with self.chat_lock:
+            # Another request may have loaded it (and appended to it) meanwhile
+            room = self.chat_rooms.get(item_id)
+            if room is None:
+                room = self.chat_rooms[item_id] = ChatRoom(messages, has_more)
+                # The deque keeps at most CHAT_BUFFER_SIZE of the loaded messages
+                self.buffered_messages += len(room.messages)
+                self._evict()
+            return list(room.messages), room.has_more
+    
+    def remember_message(self, item_id, message):
+        """Add a message (row with username) to its room if the room is hot.
+        
+        Messages come from this worker and, with a message queue, from the
+        fan-out as well, so one can arrive twice or after a newer one.
+        """
+        with self.chat_lock:
+            room = self.chat_rooms.get(item_id)
+            if room is None:
+                return  # Cold rooms are loaded in full when next needed
+            before = len(room.messages)
+            room.add(message)
+            self.buffered_messages += len(room.messages) - before
+            self.chat_rooms.move_to_end(item_id)
+            self._evict()
+    
+    def _on_fanned_out_message(self, data, room):
+        # A receive_message emit of any worker (ours included), as sent to the page
+        if not room or not room.startswith('item_'):
+            return
+        item_id = int(room[len('item_'):])
+        message = {
+            'id': data['id'],
+            'item_id': item_id,
+            'sender_id': data['sender_id'],
+            'username': data['username'],
+            'message': data['message'],
+            'timestamp': datetime.strptime(data['timestamp'], '%Y-%m-%d %H:%M:%S'),
+        }
+        with self.chat_lock:
+            tail = self.fanout_tail.pop(item_id, None)
+            if tail is None:
+                tail = deque(maxlen=CHAT_FANOUT_ROOM_TAIL)
+            before = len(tail)
+            tail.append(message)
+            self.fanout_tail[item_id] = tail
+            self.fanout_tail_size += len(tail) - before
+            while self.fanout_tail_size > CHAT_FANOUT_TAIL and len(self.fanout_tail) > 1:
+                _, dropped = self.fanout_tail.popitem(last=False)
+                self.fanout_tail_size -= len(dropped)
+        self.remember_message(item_id, message)
+    
+    def _unwritten(self, item_id, after_id=None):
+        """Messages that may not be in the DB yet: this worker's write-behind
+        queue, and other workers' messages seen through the fan-out.
+        
+        Take this before reading the DB: a batch written in between is then
+        in the page, or at worst in both (duplicates are dropped on merge).
+        """
+        floor = after_id or 0
+        unwritten = get_chat_writer().pending(item_id, floor)
+        with self.chat_lock:
+            unwritten.extend(m for m in self.fanout_tail.get(item_id, ()) if m['id'] > floor)
+        return unwritten
+    
+    def _with_unwritten(self, messages, unwritten, has_more, after_id=None):
+        # Merge a _unwritten() snapshot into a DB page, in id order
+        if after_id is not None:
+            floor = after_id
+        elif has_more and messages:
+            floor = messages[0]['id']  # older ones are on earlier pages
+        else:
+            floor = 0
+        seen = {m['id'] for m in messages}
+        extra = []
+        for message in unwritten:
+            if message['id'] > floor and message['id'] not in seen:
+                seen.add(message['id'])
+                extra.append(message)
+        if not extra:
+            return messages
+        return sorted(messages + extra, key=lambda m: m['id'])
+    
+    def forget_room(self, item_id):
+        """Drop a room from memory (e.g. when its item is removed)"""
+        with self.chat_lock:
+            room = self.chat_rooms.pop(item_id, None)
+            if room is not None:
+                self.buffered_messages -= len(room.messages)
+            tail = self.fanout_tail.pop(item_id, None)
+            if tail is not None:
+                self.fanout_tail_size -= len(tail)
+    
+    def _evict(self):
+        # Called with the lock held; the room just used is last and stays
+        while self.buffered_messages > CHAT_BUFFER_MAX_MESSAGES and len(self.chat_rooms) > 1:
+            _, room = self.chat_rooms.popitem(last=False)
+            self.buffered_messages -= len(room.messages)
     
     def chat(self, item_id):
         """Handle item chat between owner and claimer"""
@@ -54,20 +209,32 @@ class ChatRoute(BaseRoute):
             conn.close()
             return redirect(url_for('dashboard'))
         
-        # Get chat messages for this item
-        cursor.execute('''
-            SELECT cm.*, u.username 
-            FROM chat_messages cm
-            JOIN users u ON cm.sender_id = u.id
-            WHERE cm.item_id = %s
-            ORDER BY cm.timestamp ASC
-        ''', (item_id,))
-        messages = cursor.fetchall()
-        
         cursor.close()
         conn.close()
         
-        return render_template('chat.html', user=user, item=item, messages=messages)
+        # Latest page only, from the room buffer when hot; the page loads older messages on demand
+        messages, has_more = self.recent_messages(item_id)
+        
+        return render_template('chat.html', user=user, item=item, messages=messages, has_more=has_more)
+    
+    def can_chat(self, item_id, user_id):
+        """Whether the user owns or claimed the item (only they may post in its chat)"""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT user_id, claimed_by FROM lost_items 
+            WHERE id = %s AND (user_id = %s OR claimed_by = %s)
+        ''', (item_id, user_id, user_id))
+        item = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        return item is not None
+    
+    def post_message(self, item_id, user, message):
+        """Queue a message for writing and add it to the room; returns the message row"""
+        new_message = get_chat_writer().submit(item_id, user.id, user.username, message)
+        self.remember_message(item_id, new_message)
+        return new_message
     
     def send_message(self, item_id):
         """Send a chat message"""
@@ -80,44 +247,16 @@ class ChatRoute(BaseRoute):
         if not message:
             return {'error': 'Message cannot be empty'}, 400
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Verify user can send message to this item
-        cursor.execute('''
-            SELECT user_id, claimed_by FROM lost_items 
-            WHERE id = %s AND (user_id = %s OR claimed_by = %s)
-        ''', (item_id, user.id, user.id))
-        item = cursor.fetchone()
-        
-        if not item:
-            cursor.close()
-            conn.close()
+        if not self.can_chat(item_id, user.id):
             return {'error': 'Access denied. You must be either the owner or claimer of this item to chat.'}, 403
         
-        # Insert message
-        cursor.execute('''
-            INSERT INTO chat_messages (item_id, sender_id, message)
-            VALUES (%s, %s, %s)
-        ''', (item_id, user.id, message))
-        conn.commit()
-        
-        # Get the inserted message with username
-        cursor.execute('''
-            SELECT cm.*, u.username 
-            FROM chat_messages cm
-            JOIN users u ON cm.sender_id = u.id
-            WHERE cm.id = %s
-        ''', (cursor.lastrowid,))
-        new_message = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
+        new_message = self.post_message(item_id, user, message)
         
-        return {'message': new_message}, 200
+        return {'message': ChatMessage.to_json(new_message)}, 200
     
     def get_messages(self, item_id):
-        """Get chat messages for an item"""
+        """Get a page of chat messages for an item"""
         user = self.require_login()
         if not user:
             return {'error': 'Authentication required'}, 401
@@ -137,20 +276,23 @@ class ChatRoute(BaseRoute):
             conn.close()
             return {'error': 'Access denied'}, 403
         
-        # Get messages for this item
-        cursor.execute('''
-            SELECT cm.*, u.username 
-            FROM chat_messages cm
-            JOIN users u ON cm.sender_id = u.id
-            WHERE cm.item_id = %s
-            ORDER BY cm.timestamp ASC
-        ''', (item_id,))
-        messages = cursor.fetchall()
-        
         cursor.close()
         conn.close()
         
-        return {'messages': messages}, 200
+        # ?before_id= scrolls back, ?after_id= catches up, ?limit= caps the page
+        before_id = request.args.get('before_id', type=int)
+        after_id = request.args.get('after_id', type=int)
+        unwritten = self._unwritten(item_id, after_id) if before_id is None else []
+        messages, has_more = ChatMessage.get_page(item_id,
+                                                  before_id=before_id,
+                                                  after_id=after_id,
+                                                  limit=request.args.get('limit', CHAT_PAGE_SIZE, type=int))
+        # Unwritten messages are the newest ones: they belong on the latest page, or
+        # on the last catch-up page (for after_id, has_more means newer ones are left)
+        if before_id is None and (after_id is None or not has_more):
+            messages = self._with_unwritten(messages, unwritten, has_more, after_id)
+        
+        return {'messages': [ChatMessage.to_json(m) for m in messages], 'has_more': has_more}, 200
     
     def monitor_chats(self):
         """Monitor all chats (main admin only)"""
@@ -3,9 +3,10 @@ from routes.base_route import BaseRoute
 from models.user import User
 from models.item import Item
 from models.database import get_db_connection
-import os
-from datetime import datetime
-from werkzeug.utils import secure_filename
+from utils.images import schedule_renditions
+from utils.uploads import enforce_upload_limit, UploadError, ITEM_IMAGE_MAX_BYTES
+from utils.image_store import store_image
+from utils.chat_access import invalidate_item_access
 
 class ItemRoute(BaseRoute):
     """Item related routes"""
@@ -21,6 +22,9 @@ class ItemRoute(BaseRoute):
             return user
         
         if request.method == 'POST':
+            # Refuse oversized bodies before the form is parsed
+            enforce_upload_limit(ITEM_IMAGE_MAX_BYTES)
+            
             item_name = request.form.get('item_name', '').strip()
             category = request.form.get('category', '').strip()
             description = request.form.get('description', '').strip()
@@ -34,16 +38,15 @@ class ItemRoute(BaseRoute):
                 flash('Please fill in all mandatory fields (Item Name, Category, Location, and Image).', 'error')
                 return render_template('post_item.html')
             
-            # Process image upload
+            # Process image upload (type checked from the file content, not the extension)
             image_path = None
-            if image and self.allowed_file(image.filename):
-                filename = secure_filename(image.filename)
-                # Add timestamp to filename to avoid conflicts
-                name, ext = os.path.splitext(filename)
-                filename = f"{name}_{int(datetime.now().timestamp())}{ext}"
-                image.save(os.path.join(self.app.config['UPLOAD_FOLDER'], filename))
-                # Store only the filename, not the full path
-                image_path = filename
+            if image and image.filename:
+                try:
+                    # Stored by content hash, identical photos share one file
+                    image_path = store_image(image, ITEM_IMAGE_MAX_BYTES)
+                except UploadError as e:
+                    flash(str(e), 'error')
+                    return render_template('post_item.html')
             
             # Determine item status - admins don't need verification
             item_status = 'found' if user.role in ['admin', 'main_admin'] else 'lost'
@@ -59,6 +62,9 @@ class ItemRoute(BaseRoute):
             cursor.close()
             conn.close()
             
+            # Thumbnails are generated in the background
+            schedule_renditions(self.app.static_folder, image_path)
+            
             # Different success message based on user role
             if user.role in ['admin', 'main_admin']:
                 flash('Item posted successfully! As an admin, your item is immediately visible.', 'success')
@@ -105,43 +111,24 @@ class ItemRoute(BaseRoute):
         user = self.require_login()
         if not hasattr(user, 'id'):
             return user
-            
-        conn = get_db_connection()
-        cursor = conn.cursor()
         
-        # Get item details
-        cursor.execute('SELECT * FROM lost_items WHERE id = %s', (item_id,))
-        item = cursor.fetchone()
+        # One conditional UPDATE decides who wins concurrent claims
+        result = Item.claim(item_id, user.id)
         
-        if not item:
+        if result == 'not_found':
             flash('Item not found.', 'error')
-            cursor.close()
-            conn.close()
             return redirect(url_for('dashboard'))
         
-        # Check if user can claim this item
-        if item['user_id'] == user.id:
+        if result == 'own_item':
             flash('You cannot claim your own item.', 'error')
-            cursor.close()
-            conn.close()
             return redirect(url_for('item_detail', item_id=item_id))
         
-        if item['status'] in ['claimed', 'resolved']:
+        if result == 'already_claimed':
             flash('This item has already been claimed.', 'error')
-            cursor.close()
-            conn.close()
             return redirect(url_for('item_detail', item_id=item_id))
         
-        # Update item status to claimed
-        cursor.execute('''
-            UPDATE lost_items 
-            SET status = 'claimed', claimed_by = %s, claimed_at = NOW() 
-            WHERE id = %s
-        ''', (user.id, item_id))
-        conn.commit()
-        
-        cursor.close()
-        conn.close()
+        # The claimer may chat about the item now
+        invalidate_item_access(item_id)
         
         flash('Item claimed successfully! Please contact the owner to arrange pickup.', 'success')
         return redirect(url_for('item_detail', item_id=item_id))
@@ -183,6 +170,7 @@ class ItemRoute(BaseRoute):
         
         cursor.close()
         conn.close()
+        invalidate_item_access(item_id)
         
         flash('Item marked as recovered successfully!', 'success')
         return redirect(url_for('dashboard'))
@@ -255,8 +243,4 @@ class ItemRoute(BaseRoute):
             return redirect(url_for('dashboard'))
         
         # If not POST request, redirect to dashboard
-        return redirect(url_for('dashboard'))
-    
-    def allowed_file(self, filename):
-        """Check if file extension is allowed"""
-        return '.' in filename and filename.rsplit('.', 1)[1].lower() in self.app.config['ALLOWED_EXTENSIONS']
\ No newline at end of file
+        return redirect(url_for('dashboard'))
\ No newline at end of file
@@ -3,10 +3,11 @@ from routes.base_route import BaseRoute
 from models.user import User
 from models.database import get_db_connection
 from utils.otp import generate_otp, store_otp, verify_otp
+from utils.rate_limit import OTP_SEND_LIMIT
 import re
-import os
-from datetime import datetime
-from werkzeug.utils import secure_filename
+from utils.images import schedule_renditions
+from utils.uploads import enforce_upload_limit, UploadError, PROFILE_IMAGE_MAX_BYTES
+from utils.image_store import store_image, release_image
 
 class UserRoute(BaseRoute):
     """User related routes"""
@@ -22,6 +23,9 @@ class UserRoute(BaseRoute):
             return redirect(url_for('login'))
         
         if request.method == 'POST':
+            # Refuse oversized bodies before the form is parsed
+            enforce_upload_limit(PROFILE_IMAGE_MAX_BYTES)
+            
             # Handle profile updates
             username = request.form.get('username', '').strip()
             profile_image = request.files.get('profile_image')
@@ -40,32 +44,32 @@ class UserRoute(BaseRoute):
                     cursor.close()
                     conn.close()
             
-            # Update profile image
-            if profile_image and self.allowed_file(profile_image.filename):
-                filename = secure_filename(profile_image.filename)
-                # Add user ID and timestamp to filename to avoid conflicts
-                name, ext = os.path.splitext(filename)
-                filename = f"profile_{user.id}_{int(datetime.now().timestamp())}{ext}"
-                image_path = os.path.join('uploads/profiles', filename)
-                
-                # Create profiles directory if it doesn't exist
-                profiles_dir = os.path.join(self.app.config['UPLOAD_FOLDER'], 'profiles')
-                if not os.path.exists(profiles_dir):
-                    os.makedirs(profiles_dir)
-                
-                profile_image.save(os.path.join(profiles_dir, filename))
-                
+            # Update profile image (type checked from the file content, not the extension)
+            image_path = None
+            if profile_image and profile_image.filename:
+                try:
+                    # Stored by content hash, identical photos share one file
+                    image_path = f"uploads/{store_image(profile_image, PROFILE_IMAGE_MAX_BYTES)}"
+                except UploadError as e:
+                    flash(str(e), 'error')
+            
+            if image_path and image_path != user.profile_image:
                 # Update database
                 conn = get_db_connection()
                 cursor = conn.cursor()
-                cursor.execute('UPDATE users SET profile_image = %s WHERE id = %s', (f"uploads/profiles/{filename}", user.id))
+                cursor.execute('UPDATE users SET profile_image = %s WHERE id = %s', (image_path, user.id))
                 conn.commit()
                 cursor.close()
                 conn.close()
+                schedule_renditions(self.app.static_folder, image_path)
+                
+                # The previous image goes away once nothing else uses it
+                release_image(user.profile_image)
                 
                 flash('Profile image updated successfully!', 'success')
             
             # Refresh user data
+            self.invalidate_user(user.id)
             user = self.get_current_user()
         
         return render_template('profile.html', user=user)
@@ -134,6 +138,8 @@ class UserRoute(BaseRoute):
         if request.method == 'POST':
             # Check if user wants to resend OTP
             if 'resend_otp' in request.form:
+                OTP_SEND_LIMIT.check(new_email)
+                
                 # Generate and resend OTP
                 new_otp = generate_otp()
                 store_otp(email=new_email, otp=new_otp)
@@ -239,6 +245,8 @@ class UserRoute(BaseRoute):
         if request.method == 'POST':
             # Check if user wants to resend OTP
             if 'resend_otp' in request.form:
+                OTP_SEND_LIMIT.check(new_phone)
+                
                 # Generate and resend OTP
                 new_otp = generate_otp()
                 store_otp(phone=new_phone, otp=new_otp)
@@ -275,8 +283,4 @@ class UserRoute(BaseRoute):
             else:
                 flash('Invalid OTP. Please try again.', 'error')
         
-        return render_template('verify_phone_change_otp.html', user=user)
-    
-    def allowed_file(self, filename):
-        """Check if file extension is allowed"""
-        return '.' in filename and filename.rsplit('.', 1)[1].lower() in self.app.config['ALLOWED_EXTENSIONS']
\ No newline at end of file
+        return render_template('verify_phone_change_otp.html', user=user)
\ No newline at end of file
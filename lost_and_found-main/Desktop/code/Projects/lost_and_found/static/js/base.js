@@ -0,0 +1,65 @@
+// Theme toggle functionality
+const themeToggle = document.getElementById('themeToggle');
+const themeIcon = themeToggle.querySelector('i');
+
+// Load theme from localStorage on page load
+document.addEventListener('DOMContentLoaded', function() {
+    const savedTheme = localStorage.getItem('theme');
+    if (savedTheme) {
+        document.documentElement.setAttribute('data-theme', savedTheme);
+        // Update icon based on saved theme
+        if (savedTheme === 'dark') {
+            themeIcon.classList.remove('fa-moon');
+            themeIcon.classList.add('fa-sun');
+        } else {
+            themeIcon.classList.remove('fa-sun');
+            themeIcon.classList.add('fa-moon');
+        }
+    }
+});
+
+// Set initial theme icon (fallback)
+if (document.documentElement.getAttribute('data-theme') === 'dark') {
+    themeIcon.classList.remove('fa-moon');
+    themeIcon.classList.add('fa-sun');
+}
+
+themeToggle.addEventListener('click', function() {
+    const currentTheme = document.documentElement.getAttribute('data-theme');
+    if (currentTheme === 'dark') {
+        document.documentElement.setAttribute('data-theme', 'light');
+        localStorage.setItem('theme', 'light');
+        themeIcon.classList.remove('fa-sun');
+        themeIcon.classList.add('fa-moon');
+    } else {
+        document.documentElement.setAttribute('data-theme', 'dark');
+        localStorage.setItem('theme', 'dark');
+        themeIcon.classList.remove('fa-moon');
+        themeIcon.classList.add('fa-sun');
+    }
+});
+
+// Add animation to item cards when they appear
+document.addEventListener('DOMContentLoaded', function() {
+    const itemCards = document.querySelectorAll('.item-card');
+    itemCards.forEach((card, index) => {
+        // Add a staggered animation delay
+        setTimeout(() => {
+            card.classList.add('visible');
+        }, 200 * index);
+    });
+});
+
+// Password toggle functionality
+document.querySelectorAll('.password-toggle-btn').forEach(button => {
+    button.addEventListener('click', function() {
+        // Get the input field - it's the previous sibling of the button's parent (input-group)
+        const inputGroup = this.parentElement;
+        const input = inputGroup.querySelector('input');
+        const type = input.getAttribute('type') === 'password' ? 'text' : 'password';
+        input.setAttribute('type', type);
+        const icon = this.querySelector('i');
+        icon.classList.toggle('fa-eye');
+        icon.classList.toggle('fa-eye-slash');
+    });
+});
@@ -0,0 +1,58 @@
+import hashlib
+import os
+import threading
+from flask import request
+
+# Fingerprinted static URLs never change content, so browsers may keep them for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+FINGERPRINT_LENGTH = 12
+
+_fingerprints = {}  # filename -> (mtime, size, fingerprint)
+_lock = threading.Lock()
+
+
+def fingerprint(static_folder, filename):
+    """Short content hash of a static file, recomputed only when the file changes"""
+    path = os.path.join(static_folder, filename)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    cached = _fingerprints.get(filename)
+    if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    value = digest.hexdigest()[:FINGERPRINT_LENGTH]
+    with _lock:
+        _fingerprints[filename] = (stat.st_mtime, stat.st_size, value)
+    return value
+
+
+def init_app(app):
+    """Fingerprint url_for('static', ...) URLs and serve them as immutable.
+
+    Every static URL gets a ?v=<content hash> parameter, so a changed file
+    gets a new URL and the old one can be cached forever.
+    """
+
+    @app.url_defaults
+    def _add_fingerprint(endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            value = fingerprint(app.static_folder, values['filename'])
+            if value:
+                values['v'] = value
+
+    @app.after_request
+    def _cache_fingerprinted(response):
+        if request.endpoint == 'static' and response.status_code == 200:
+            requested = request.args.get('v')
+            filename = (request.view_args or {}).get('filename')
+            # Only a matching fingerprint is safe to cache forever
+            if requested and filename and requested == fingerprint(app.static_folder, filename):
+                response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
@@ -0,0 +1,89 @@
+import time
+import threading
+from collections import OrderedDict
+from flask import session
+from utils import fanout
+
+# Invalidations reach every worker through the fan-out (utils/fanout.py); the
+# TTL only covers one lost while a worker was reconnecting to the queue
+CHAT_ACCESS_TTL = 30
+
+# Items and users whose access changed lately, mapped to the stamp of their
+# last change (one counter for both). Cached answers remember the stamps they
+# were computed at. Only the most recent CHAT_ACCESS_TRACKED changes are kept;
+# an untracked key reads as the newest stamp evicted so far, so forgetting one
+# can only force a fresh check, never revive an outdated answer.
+CHAT_ACCESS_TRACKED = 10000
+
+_item_generations = OrderedDict()
+_user_generations = OrderedDict()
+_evicted = {'item': 0, 'user': 0}
+_stamp = 0
+_lock = threading.Lock()
+
+
+def _generations(item_id, user_id):
+    with _lock:
+        return [_item_generations.get(item_id, _evicted['item']), _user_generations.get(user_id, _evicted['user'])]
+
+
+def _bump(generations, kind, key):
+    # Called with the lock held. Entries stay ordered by stamp, so the oldest
+    # one goes first and the eviction floor only grows.
+    global _stamp
+    _stamp += 1
+    generations[key] = _stamp
+    generations.move_to_end(key)
+    while len(generations) > CHAT_ACCESS_TRACKED:
+        _, stamp = generations.popitem(last=False)
+        _evicted[kind] = stamp
+
+
+def _on_invalidated(data, room):
+    with _lock:
+        if 'item_id' in data:
+            _bump(_item_generations, 'item', data['item_id'])
+        if 'user_id' in data:
+            _bump(_user_generations, 'user', data['user_id'])
+
+
+fanout.on_emit('chat_access_invalidated', _on_invalidated)
+
+
+def invalidate_item_access(item_id):
+    """Forget cached chat access for an item (claimed, recovered or removed), on every worker"""
+    fanout.publish('chat_access_invalidated', {'item_id': item_id})
+
+
+def invalidate_user_access(user_id):
+    """Forget cached chat access for a user (e.g. removed), on every worker"""
+    fanout.publish('chat_access_invalidated', {'user_id': user_id})
+
+
+def check_chat_access(item_id, user_id, load):
+    """Whether ``user_id`` may chat about ``item_id``, cached in the Socket.IO session.
+
+    ``load(item_id, user_id)`` does the real check; it runs on join and again
+    only after an invalidation or once the cached answer is older than
+    CHAT_ACCESS_TTL. Only allowed answers are cached, so access granted later
+    (e.g. by a claim) counts at once. Only call this from Socket.IO handlers,
+    whose session lives with the connection rather than in the cookie.
+    """
+    generations = _generations(item_id, user_id)
+    cache = session.setdefault('chat_access', {})
+    entry = cache.get(str(item_id))
+    if (entry and entry['user_id'] == user_id and entry['generations'] == generations
+            and entry['expires_at'] > time.time()):
+        return True
+
+    allowed = load(item_id, user_id)
+    if allowed:
+        cache[str(item_id)] = {
+            'user_id': user_id,
+            'generations': generations,
+            'expires_at': time.time() + CHAT_ACCESS_TTL,
+        }
+    else:
+        cache.pop(str(item_id), None)
+    session.modified = True
+    return allowed
@@ -0,0 +1,337 @@
+import os
+import time
+import atexit
+import logging
+import threading
+import pymysql
+from datetime import datetime
+from models.database import get_pool, create_raw_connection
+
+logger = logging.getLogger(__name__)
+
+# Queued messages are written at least this often (seconds) or once this many are waiting
+CHAT_FLUSH_INTERVAL = float(os.environ.get('CHAT_FLUSH_INTERVAL', 0.05))
+CHAT_FLUSH_BATCH = int(os.environ.get('CHAT_FLUSH_BATCH', 200))
+# Past this many unwritten messages senders write synchronously (backpressure)
+CHAT_MAX_PENDING = 10000
+CHAT_RETRY_MAX_DELAY = 5
+CHAT_SHUTDOWN_TIMEOUT = 10
+
+# Message ids: 38 bits of centiseconds since ID_EPOCH, 5 bits of worker id and
+# 10 bits of sequence. 53 bits in total, so they survive JSON / JavaScript
+# numbers; time ordered, so paging by id stays chronological. Every process
+# writing chat holds its own worker id (0-31), leased from the database.
+ID_EPOCH = datetime(2024, 1, 1).timestamp()
+WORKER_BITS = 5
+SEQUENCE_BITS = 10
+TIMESTAMP_BITS = 38
+
+# Worker ids are GET_LOCK slots held on a dedicated connection for the life of
+# the process, so every worker of a "gunicorn -w N" gets a different one from
+# the same environment. CHAT_WORKER_ID only sets the slot tried first.
+WORKER_LOCK_PREFIX = 'lost_and_found.chat_worker_'
+WORKER_LEASE_CHECK_INTERVAL = 30
+
+_INSERT_MESSAGE = '''
+    INSERT INTO chat_messages (id, item_id, sender_id, message, timestamp)
+    VALUES (%s, %s, %s, %s, %s)
+'''
+
+
+class ChatIdConflict(RuntimeError):
+    """Raised when a message id was issued twice (two processes share a worker id)"""
+    pass
+
+
+class WorkerIdLease:
+    """Holds one of the 32 worker id slots for as long as the process runs.
+
+    A background thread pings the lease connection. If it was lost (and the
+    lock with it), the lease is taken again, the same slot if still free, and
+    ``on_change`` is told when the id had to change.
+    """
+
+    def __init__(self, preferred=None, connect=create_raw_connection,
+                 check_interval=WORKER_LEASE_CHECK_INTERVAL, on_change=None):
+        if preferred is None:
+            env = os.environ.get('CHAT_WORKER_ID')
+            preferred = int(env) if env is not None else os.getpid()
+        self.preferred = preferred % (1 << WORKER_BITS)
+        self.connect = connect
+        self.check_interval = check_interval
+        self.on_change = on_change
+        self.worker_id = None
+        self._conn = None
+        self._thread = None
+
+    def acquire(self):
+        """Take a free slot (the preferred one first) and return its worker id"""
+        conn = self.connect()
+        slots = 1 << WORKER_BITS
+        start = self.worker_id if self.worker_id is not None else self.preferred
+        try:
+            cursor = conn.cursor()
+            for offset in range(slots):
+                worker_id = (start + offset) % slots
+                cursor.execute('SELECT GET_LOCK(%s, 0) AS locked', (f"{WORKER_LOCK_PREFIX}{worker_id}",))
+                if cursor.fetchone()['locked']:
+                    break
+            else:
+                raise RuntimeError(f"All {slots} chat worker ids are taken by other processes")
+            cursor.close()
+        except BaseException:
+            conn.close()
+            raise
+
+        self._conn = conn
+        self.worker_id = worker_id
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._keep_alive, name='chat-worker-lease', daemon=True)
+            self._thread.start()
+        return worker_id
+
+    def _keep_alive(self):
+        while True:
+            time.sleep(self.check_interval)
+            try:
+                self._conn.ping(reconnect=False)
+                continue
+            except Exception:
+                pass
+            previous = self.worker_id
+            logger.warning("Lost the lease on chat worker id %s, taking it again", previous)
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            try:
+                worker_id = self.acquire()
+            except Exception as e:
+                logger.error("Could not lease a chat worker id: %s", e)
+                continue
+            if worker_id != previous:
+                logger.warning("Chat worker id %s was taken meanwhile, now using %s", previous, worker_id)
+                if self.on_change is not None:
+                    self.on_change(worker_id)
+
+
+class IdGenerator:
+    """Time ordered 53-bit ids, unique per worker id"""
+
+    def __init__(self, worker_id):
+        if not 0 <= worker_id < (1 << WORKER_BITS):
+            raise ValueError(f"Worker id must be between 0 and {(1 << WORKER_BITS) - 1}")
+        self.worker_id = worker_id
+        self._lock = threading.Lock()
+        self._last_tick = -1
+        self._sequence = 0
+
+    def _tick(self):
+        return int((time.time() - ID_EPOCH) * 100)
+
+    def next_id(self):
+        with self._lock:
+            tick = self._tick()
+            if tick < self._last_tick:
+                # Clock went backwards: keep issuing from the last tick
+                tick = self._last_tick
+            if tick == self._last_tick:
+                self._sequence = (self._sequence + 1) & ((1 << SEQUENCE_BITS) - 1)
+                if self._sequence == 0:
+                    # 1024 ids used in this centisecond, wait for the next one
+                    while tick <= self._last_tick:
+                        time.sleep(0.001)
+                        tick = self._tick()
+            else:
+                self._sequence = 0
+            self._last_tick = tick
+            if tick >= (1 << TIMESTAMP_BITS):
+                raise OverflowError('Message id timestamp bits exhausted')
+            return (tick << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self._sequence
+
+    def set_worker_id(self, worker_id):
+        """Issue ids for another worker id from now on (after a lease moved)"""
+        with self._lock:
+            self.worker_id = worker_id
+
+
+class ChatWriter:
+    """Write-behind queue for chat messages.
+
+    submit() assigns the id and timestamp and returns at once, so the message
+    can be broadcast before it is stored. A background thread writes queued
+    messages with one multi-row INSERT per batch. Failed batches are retried,
+    and the queue is flushed on interpreter exit. A hard crash can lose up to
+    CHAT_FLUSH_INTERVAL worth of messages.
+    """
+
+    def __init__(self, flush_interval=CHAT_FLUSH_INTERVAL, batch_size=CHAT_FLUSH_BATCH,
+                 max_pending=CHAT_MAX_PENDING, id_generator=None):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        if id_generator is None:
+            lease = WorkerIdLease()
+            id_generator = IdGenerator(lease.acquire())
+            lease.on_change = id_generator.set_worker_id
+        self.ids = id_generator
+        self._pending = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()  # one batch in flight at a time keeps ids ordered on disk
+        self._thread = None
+        self._stopping = False
+        self.stats = {'submitted': 0, 'written': 0, 'batches': 0, 'retries': 0}
+
+    def submit(self, item_id, sender_id, username, message):
+        """Queue a message and return it as a row (id, timestamp and username included)"""
+        row = {
+            'id': self.ids.next_id(),
+            'item_id': item_id,
+            'sender_id': sender_id,
+            'username': username,
+            'message': message,
+            'timestamp': datetime.now().replace(microsecond=0),
+        }
+        with self._cond:
+            self._pending.append(row)
+            self.stats['submitted'] += 1
+            backlog = len(self._pending)
+            self._start()
+            if backlog >= self.batch_size:
+                self._cond.notify()
+        if backlog > self.max_pending:
+            # The database is falling behind; make the sender wait for a write
+            self.flush()
+        return row
+
+    def pending(self, item_id, after_id=0):
+        """Queued (not yet written) messages of an item newer than ``after_id``"""
+        with self._cond:
+            return [row for row in self._pending if row['item_id'] == item_id and row['id'] > after_id]
+
+    def _start(self):
+        # Called with the lock held
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='chat-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        delay = self.flush_interval
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._pending) < self.batch_size:
+                    self._cond.wait(delay)
+                if self._stopping and not self._pending:
+                    return
+            try:
+                self.flush()
+                delay = self.flush_interval
+            except Exception as e:
+                # Messages stay queued; back off while the database is unavailable
+                delay = min(CHAT_RETRY_MAX_DELAY, max(delay, self.flush_interval) * 2)
+                self.stats['retries'] += 1
+                logger.error("Writing chat messages failed, retrying in %.2fs: %s", delay, e)
+                if self._stopping:
+                    return
+
+    def flush(self):
+        """Write everything queued so far; raises if the database write fails"""
+        with self._write_lock:
+            while True:
+                with self._cond:
+                    batch = self._pending[:self.batch_size]
+                if not batch:
+                    return
+                self._write(batch)
+                with self._cond:
+                    # Only remove once stored, so readers see each message in one place or the other
+                    del self._pending[:len(batch)]
+                    self.stats['written'] += len(batch)
+                    self.stats['batches'] += 1
+
+    def _write(self, batch):
+        # Always a connection of our own: flush() can run inside a request
+        # (backpressure), whose connection holds the caller's own writes
+        conn = get_pool().connect()
+        cursor = conn.cursor()
+        try:
+            try:
+                # executemany turns this into one multi-row INSERT
+                cursor.executemany(_INSERT_MESSAGE, [self._params(row) for row in batch])
+                written = cursor.rowcount
+            except pymysql.err.IntegrityError:
+                # Some row is in the way: the batch is retried after a commit
+                # whose reply got lost, an id is taken or an item was deleted
+                conn.rollback()
+                written = self._write_rows(cursor, batch)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+        if written < len(batch):
+            logger.error("Stored %d of %d chat messages; the rest were dropped", written, len(batch))
+
+    def _write_rows(self, cursor, batch):
+        """Insert one row at a time, settling each conflict; returns rows stored"""
+        written = 0
+        for row in batch:
+            try:
+                cursor.execute(_INSERT_MESSAGE, self._params(row))
+                written += 1
+                continue
+            except pymysql.err.IntegrityError as e:
+                if e.args[0] != 1062:  # Not ER_DUP_ENTRY: the item is gone
+                    logger.warning("Dropping chat message %s: %s", row['id'], e)
+                    continue
+
+            cursor.execute('SELECT item_id, sender_id, message FROM chat_messages WHERE id = %s', (row['id'],))
+            existing = cursor.fetchone()
+            if existing and (existing['item_id'], existing['sender_id'], existing['message']) == \
+                    (row['item_id'], row['sender_id'], row['message']):
+                written += 1  # Stored by an earlier attempt of this batch
+                continue
+
+            # Another worker issued the same id. Clients already have the message
+            # under it, so it can't be renumbered: this is a configuration error.
+            logger.critical("Chat message id %s is already taken by another message; "
+                            "is worker id %s used by two processes?", row['id'], self.ids.worker_id)
+            raise ChatIdConflict(f"Chat message id {row['id']} is already taken")
+        return written
+
+    @staticmethod
+    def _params(row):
+        return (row['id'], row['item_id'], row['sender_id'], row['message'], row['timestamp'])
+
+    def shutdown(self, timeout=CHAT_SHUTDOWN_TIMEOUT):
+        """Write every queued message before the process exits"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        with self._cond:
+            left = len(self._pending)
+        if left:
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Lost %d unwritten chat message(s) on shutdown: %s", left, e)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_chat_writer():
+    """The process wide chat writer, flushed on interpreter exit"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ChatWriter()
+                atexit.register(_writer.shutdown)
+    return _writer
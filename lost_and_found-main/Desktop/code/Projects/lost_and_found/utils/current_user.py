@@ -0,0 +1,30 @@
+from flask import g, session, has_request_context
+from models.user import User
+
+
+def get_current_user():
+    """Resolve the logged in user once per request.
+
+    Shared by BaseRoute and the get_current_user template global, so a page
+    that extends base.html looks the user up once at most.
+    """
+    if not has_request_context():
+        return None
+
+    user_id = session.get('user_id')
+    cached = g.get('_current_user')
+    if cached is not None and cached[0] == user_id:
+        return cached[1]
+
+    user = User.get_cached(user_id) if user_id else None
+    g._current_user = (user_id, user)
+    return user
+
+
+def invalidate_user(user_id=None):
+    """Forget cached copies of a user (or of every user) after it changed"""
+    User.invalidate_cache(user_id)
+    if has_request_context():
+        cached = g.get('_current_user')
+        if cached is not None and (user_id is None or cached[0] == user_id):
+            g.pop('_current_user', None)
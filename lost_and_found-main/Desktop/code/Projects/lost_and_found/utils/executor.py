@@ -0,0 +1,187 @@
+import os
+import queue
+import atexit
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# Shared background pool for short side tasks (OTP generation, notifications)
+BACKGROUND_WORKERS = int(os.environ.get('BACKGROUND_WORKERS', 4))
+BACKGROUND_QUEUE_SIZE = int(os.environ.get('BACKGROUND_QUEUE_SIZE', 100))
+# What happens when the queue is full: 'reject' (raise ExecutorRejected),
+# 'caller_runs' (run the task in the submitting thread) or 'block'
+BACKGROUND_FULL_POLICY = os.environ.get('BACKGROUND_FULL_POLICY', 'reject')
+BACKGROUND_BLOCK_TIMEOUT = 5
+SHUTDOWN_TIMEOUT = 10
+
+POLICIES = ('reject', 'caller_runs', 'block')
+
+_STOP = object()
+
+
+class ExecutorRejected(RuntimeError):
+    """Raised when a task is refused because the queue is full or the pool is shut down"""
+    pass
+
+
+class BoundedExecutor:
+    """Fixed number of worker threads fed from a bounded queue.
+
+    Unlike starting a thread per task, a burst of submissions can never
+    create more than ``max_workers`` threads (and DB connections); once
+    ``max_queue`` tasks are waiting the ``policy`` decides what happens.
+    """
+
+    def __init__(self, max_workers=BACKGROUND_WORKERS, max_queue=BACKGROUND_QUEUE_SIZE,
+                 policy=BACKGROUND_FULL_POLICY, name='background', block_timeout=BACKGROUND_BLOCK_TIMEOUT):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue full policy {policy!r}, expected one of {', '.join(POLICIES)}")
+        self.max_workers = max_workers
+        self.policy = policy
+        self.name = name
+        self.block_timeout = block_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._shutdown = False
+        self._active = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._run_total = 0.0
+        self._wait_max = 0.0
+        self._run_max = 0.0
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` and return a Future for its result"""
+        future = Future()
+        task = (future, fn, args, kwargs, time.monotonic())
+        with self._lock:
+            if self._shutdown:
+                self._rejected += 1
+                raise ExecutorRejected(f"{self.name} executor is shut down")
+            self._submitted += 1
+            self._start_workers()
+
+        try:
+            if self.policy == 'block':
+                self._queue.put(task, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(task)
+        except queue.Full:
+            if self.policy == 'caller_runs':
+                # Backpressure: the submitting request does the work itself
+                self._run(task)
+                return future
+            with self._lock:
+                self._submitted -= 1
+                self._rejected += 1
+            raise ExecutorRejected(f"{self.name} executor queue is full")
+        return future
+
+    def _start_workers(self):
+        # Called with the lock held; threads are started lazily on first use
+        while len(self._threads) < self.max_workers:
+            thread = threading.Thread(target=self._worker, name=f"{self.name}-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _worker(self):
+        while True:
+            task = self._queue.get()
+            if task is _STOP:
+                return
+            self._run(task)
+
+    def _run(self, task):
+        future, fn, args, kwargs, queued_at = task
+        if not future.set_running_or_notify_cancel():
+            return
+        started = time.monotonic()
+        with self._lock:
+            self._active += 1
+        failed = False
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            failed = True
+            logger.error("%s task %s failed: %s", self.name, getattr(fn, '__name__', fn), e)
+            future.set_exception(e)
+        finally:
+            finished = time.monotonic()
+            with self._lock:
+                self._active -= 1
+                self._completed += 1
+                self._failed += failed
+                wait, run = started - queued_at, finished - started
+                self._wait_total += wait
+                self._run_total += run
+                self._wait_max = max(self._wait_max, wait)
+                self._run_max = max(self._run_max, run)
+
+    def metrics(self):
+        """Queue depth, worker usage, counters and task latency (seconds)"""
+        with self._lock:
+            completed = self._completed
+            return {
+                'workers': len(self._threads),
+                'max_workers': self.max_workers,
+                'active': self._active,
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'submitted': self._submitted,
+                'completed': completed,
+                'failed': self._failed,
+                'rejected': self._rejected,
+                'avg_wait': self._wait_total / completed if completed else 0.0,
+                'max_wait': self._wait_max,
+                'avg_run': self._run_total / completed if completed else 0.0,
+                'max_run': self._run_max,
+            }
+
+    def shutdown(self, wait=True, timeout=SHUTDOWN_TIMEOUT):
+        """Stop accepting tasks, let queued ones finish, then stop the workers"""
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            threads = list(self._threads)
+        deadline = time.monotonic() + timeout
+        for _ in threads:
+            # The stop markers queue up behind the remaining tasks. Give up once
+            # the deadline passes: with the queue full and the workers stuck, a
+            # plain put() would hang the process at exit (the threads are daemons).
+            try:
+                if wait:
+                    self._queue.put(_STOP, timeout=max(0, deadline - time.monotonic()))
+                else:
+                    self._queue.put_nowait(_STOP)
+            except queue.Full:
+                logger.warning("%s executor queue still full at shutdown, not waiting for its workers", self.name)
+                return
+        if wait:
+            for thread in threads:
+                thread.join(max(0, deadline - time.monotonic()))
+            unfinished = self._queue.qsize()
+            if unfinished:
+                logger.warning("%s executor shut down with %d task(s) still queued", self.name, unfinished)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """The process wide background executor, drained on interpreter exit"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = BoundedExecutor()
+                atexit.register(_executor.shutdown)
+    return _executor
@@ -0,0 +1,323 @@
+import os
+import json
+import time
+import socket
+import logging
+import threading
+import socketserver
+
+try:
+    from socketio import PubSubManager, RedisManager, KombuManager
+except ImportError:  # python-socketio comes with Flask-SocketIO; the broker works without it
+    PubSubManager = RedisManager = KombuManager = None
+
+logger = logging.getLogger(__name__)
+
+# Socket.IO fan-out between worker processes.
+#
+# Flask-SocketIO keeps rooms in process memory, so with several workers an emit
+# only reaches clients connected to the same worker. Pointing every worker at
+# the same message queue makes each emit go through the queue and get delivered
+# by every worker to its own clients.
+#
+# SOCKETIO_MESSAGE_QUEUE picks the queue:
+#
+# - unset: single process, no fan-out (default)
+# - unix:///path/to/socket: the bundled broker below, for local multi-process
+#   setups and tests without external services
+# - redis:// or rediss://: Redis, through python-socketio's RedisManager
+# - anything else (amqp://, ...): through python-socketio's KombuManager
+#
+# Redis and Kombu need their client library (redis, kombu) installed.
+#
+# The bundled broker relays newline-delimited JSON frames between everyone
+# connected to it. Run it with "python fanout_broker.py", or set
+# SOCKETIO_FANOUT_EMBEDDED=1 to have the first worker start it in a thread.
+
+SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE', '')
+SOCKETIO_FANOUT_EMBEDDED = os.environ.get('SOCKETIO_FANOUT_EMBEDDED', '0') == '1'
+DEFAULT_SOCKET_PATH = '/tmp/lost_and_found_fanout.sock'
+CHANNEL = 'lost_and_found'
+
+RECONNECT_MAX_DELAY = 5
+# A subscriber this far behind is dropped rather than slowing everyone down
+SUBSCRIBER_MAX_BACKLOG = 10000
+
+
+def socket_path(url):
+    """Filesystem path of a unix:// message queue URL"""
+    path = url[len('unix://'):]
+    return path or DEFAULT_SOCKET_PATH
+
+
+# First line a connection sends to receive frames; publish-only connections skip it
+SUBSCRIBE = b'SUBSCRIBE\n'
+
+
+class _BrokerHandler(socketserver.StreamRequestHandler):
+    """One connected worker: every frame it sends is relayed to every subscriber"""
+
+    def setup(self):
+        super().setup()
+        self.outbox = []
+        self.outbox_ready = threading.Condition()
+        self.closed = False
+        self.writer = None
+
+    def handle(self):
+        for line in self.rfile:
+            if line == SUBSCRIBE:
+                if self.writer is None:
+                    self.writer = threading.Thread(target=self._write_loop, daemon=True)
+                    self.writer.start()
+                    self.server.register(self)
+            elif line.strip():
+                self.server.relay(line)
+
+    def finish(self):
+        self.server.unregister(self)
+        with self.outbox_ready:
+            self.closed = True
+            self.outbox_ready.notify()
+        super().finish()
+
+    def send(self, line):
+        with self.outbox_ready:
+            if len(self.outbox) >= SUBSCRIBER_MAX_BACKLOG:
+                logger.warning("Dropping fan-out subscriber that fell %d frames behind", len(self.outbox))
+                self.closed = True
+                self.request.shutdown(socket.SHUT_RDWR)
+            else:
+                self.outbox.append(line)
+            self.outbox_ready.notify()
+
+    def _write_loop(self):
+        # Writes happen off the relaying thread so one slow reader doesn't block the rest
+        while True:
+            with self.outbox_ready:
+                while not self.outbox and not self.closed:
+                    self.outbox_ready.wait()
+                if self.closed:
+                    return
+                lines, self.outbox = self.outbox, []
+            try:
+                self.wfile.write(b''.join(lines))
+                self.wfile.flush()
+            except OSError:
+                return
+
+
+class FanoutBroker(socketserver.ThreadingUnixStreamServer):
+    """Unix socket broker relaying every frame to every connected client"""
+
+    daemon_threads = True
+
+    def __init__(self, path=DEFAULT_SOCKET_PATH):
+        self.path = path
+        self._clients = set()
+        self._clients_lock = threading.Lock()
+        self.relayed = 0  # frames received from publishers
+        if os.path.exists(path):
+            if _is_listening(path):
+                raise OSError(f"A fan-out broker is already listening on {path}")
+            os.remove(path)  # left over from a broker that died
+        super().__init__(path, _BrokerHandler)
+
+    def register(self, handler):
+        with self._clients_lock:
+            self._clients.add(handler)
+
+    def unregister(self, handler):
+        with self._clients_lock:
+            self._clients.discard(handler)
+
+    def relay(self, line):
+        with self._clients_lock:
+            clients = list(self._clients)
+            self.relayed += 1
+        for client in clients:
+            client.send(line)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _is_listening(path):
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+def start_broker_thread(path=DEFAULT_SOCKET_PATH):
+    """Run a broker in a daemon thread of this process; returns it (None if one already runs)"""
+    try:
+        broker = FanoutBroker(path)
+    except OSError as e:
+        logger.info("Not starting embedded fan-out broker: %s", e)
+        return None
+    thread = threading.Thread(target=broker.serve_forever, name='fanout-broker', daemon=True)
+    thread.start()
+    return broker
+
+
+class FanoutClient:
+    """Publishes frames to and reads frames from a broker, reconnecting as needed"""
+
+    def __init__(self, path=DEFAULT_SOCKET_PATH, channel=CHANNEL):
+        self.path = path
+        self.channel = channel
+        self._publish_sock = None
+        self._publish_lock = threading.Lock()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.path)
+        return sock
+
+    def publish(self, data):
+        frame = (json.dumps({'channel': self.channel, 'data': data}, default=str) + '\n').encode()
+        with self._publish_lock:
+            for attempt in (1, 2):
+                try:
+                    if self._publish_sock is None:
+                        self._publish_sock = self._connect()
+                    self._publish_sock.sendall(frame)
+                    return
+                except OSError:
+                    if self._publish_sock is not None:
+                        self._publish_sock.close()
+                        self._publish_sock = None
+                    if attempt == 2:
+                        raise
+
+    def listen(self):
+        """Yield the data of every frame on this channel, forever"""
+        delay = 0.1
+        while True:
+            try:
+                sock = self._connect()
+            except OSError as e:
+                logger.warning("Fan-out broker unavailable (%s), retrying in %.1fs", e, delay)
+                time.sleep(delay)
+                delay = min(RECONNECT_MAX_DELAY, delay * 2)
+                continue
+            delay = 0.1
+            try:
+                sock.sendall(SUBSCRIBE)
+                with sock.makefile('rb') as frames:
+                    for line in frames:
+                        try:
+                            frame = json.loads(line)
+                        except ValueError:
+                            continue
+                        if frame.get('channel') == self.channel:
+                            yield frame['data']
+            except OSError:
+                pass
+            finally:
+                sock.close()
+            logger.warning("Lost connection to the fan-out broker, reconnecting")
+
+
+if PubSubManager is not None:
+    class _ListenerMixin:
+        """Hands every emit received from the queue to the on_emit() listeners"""
+
+        def _handle_emit(self, message):
+            _dispatch(message)
+            return super()._handle_emit(message)
+
+    class UnixSocketManager(_ListenerMixin, PubSubManager):
+        """python-socketio client manager that shares rooms through the bundled broker"""
+
+        name = 'unix'
+
+        def __init__(self, url='unix://' + DEFAULT_SOCKET_PATH, channel=CHANNEL,
+                     write_only=False, logger=None):
+            super().__init__(channel=channel, write_only=write_only, logger=logger)
+            self.client = FanoutClient(socket_path(url), channel)
+
+        def _publish(self, data):
+            self.client.publish(data)
+
+        def _listen(self):
+            yield from self.client.listen()
+
+    class RedisFanoutManager(_ListenerMixin, RedisManager):
+        """python-socketio's Redis manager, feeding on_emit() listeners"""
+        pass
+
+    class KombuFanoutManager(_ListenerMixin, KombuManager):
+        """python-socketio's Kombu (AMQP and others) manager, feeding on_emit() listeners"""
+        pass
+else:
+    UnixSocketManager = RedisFanoutManager = KombuFanoutManager = None
+
+
+def socketio_options(url=SOCKETIO_MESSAGE_QUEUE):
+    """Keyword arguments for SocketIO() that enable fan-out for ``url`` (none if unset)"""
+    if not url:
+        return {}
+    if PubSubManager is None:
+        raise RuntimeError('python-socketio is required for SOCKETIO_MESSAGE_QUEUE')
+    if url.startswith('unix://'):
+        if SOCKETIO_FANOUT_EMBEDDED:
+            start_broker_thread(socket_path(url))
+        return {'client_manager': UnixSocketManager(url)}
+    # Redis URLs go to Redis, everything else to Kombu (which reads the scheme)
+    if url.startswith(('redis://', 'rediss://')):
+        return {'client_manager': RedisFanoutManager(url, channel=CHANNEL)}
+    return {'client_manager': KombuFanoutManager(url, channel=CHANNEL)}
+
+
+# Fanned-out emits seen by this worker.
+#
+# With a message queue every worker gets every emit, its own included, and
+# delivers it to its clients. Listeners registered with on_emit() see those
+# emits too, so state a worker keeps in memory (like the chat room buffers)
+# can follow what happened on the other workers. publish() sends an event to
+# those listeners only.
+
+# Room no client ever joins, for events meant only for on_emit() listeners
+INTERNAL_ROOM = 'lost_and_found.internal'
+
+_listeners = {}
+_socketio = None
+_fanned_out = False
+
+
+def on_emit(event, callback):
+    """Call ``callback(data, room)`` for every emit of ``event`` on any worker"""
+    _listeners.setdefault(event, []).append(callback)
+
+
+def _dispatch(message):
+    for callback in _listeners.get(message.get('event'), ()):
+        try:
+            callback(message.get('data'), message.get('room'))
+        except Exception:
+            logger.exception("Fan-out listener for %r failed", message.get('event'))
+
+
+def install(socketio):
+    """Let publish() reach the other workers through ``socketio``'s message queue"""
+    global _socketio, _fanned_out
+    _socketio = socketio
+    # Only our managers feed on_emit() listeners; without one this is a single
+    # process, which already saw everything it emitted
+    _fanned_out = PubSubManager is not None and isinstance(socketio.server.manager, _ListenerMixin)
+
+
+def publish(event, data):
+    """Send ``event`` to the on_emit() listeners of every worker, this one included"""
+    # This worker's listeners run right away; through the queue they see it again
+    _dispatch({'event': event, 'data': data, 'room': None})
+    if _fanned_out:
+        _socketio.emit(event, data, to=INTERNAL_ROOM)
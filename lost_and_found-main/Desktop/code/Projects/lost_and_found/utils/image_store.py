@@ -0,0 +1,163 @@
+import os
+import re
+import time
+import logging
+from contextlib import contextmanager
+from models.database import get_db_connection
+from utils.uploads import receive_image
+from utils.images import RENDITIONS, rendition_path
+
+logger = logging.getLogger(__name__)
+
+# Content addressed image store under static/uploads/<ab>/<cd>/<sha256><ext>
+STATIC_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+UPLOAD_ROOT = os.path.join(STATIC_FOLDER, 'uploads')
+
+# Files touched more recently than this are never collected, so an upload that
+# was deduplicated against a file just before its last reference went away
+# doesn't lose its bytes
+GC_GRACE_SECONDS = 300
+
+# Storing and releasing the same content take a named lock on its hash, so a
+# release can't delete a file that a concurrent upload just deduplicated into
+IMAGE_LOCK_TIMEOUT = 10
+
+_KEY_RE = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.(jpg|png|gif)$')
+
+
+def image_key(image_url):
+    """Store key ('ab/cd/<hash>.ext') of an image_url / profile_image value, or None"""
+    if not image_url:
+        return None
+    key = image_url[len('uploads/'):] if image_url.startswith('uploads/') else image_url
+    return key if _KEY_RE.match(key) else None
+
+
+def _key_path(key):
+    return os.path.join(UPLOAD_ROOT, *key.split('/'))
+
+
+@contextmanager
+def _key_lock(key):
+    """Hold the named lock of a stored image; yields (conn, cursor)"""
+    # Lock names are limited to 64 characters; 40 hex digits of the hash are plenty
+    name = f"lost_and_found.image.{key.split('/')[-1][:40]}"
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT GET_LOCK(%s, %s) AS locked', (name, IMAGE_LOCK_TIMEOUT))
+    if not cursor.fetchone()['locked']:
+        cursor.close()
+        conn.close()
+        raise RuntimeError('Timed out waiting for another upload of the same image')
+    try:
+        yield conn, cursor
+    finally:
+        cursor.execute('SELECT RELEASE_LOCK(%s)', (name,))
+        cursor.close()
+        conn.close()
+
+
+def store_image(file_storage, max_bytes):
+    """Store an uploaded image by content hash and return its key.
+
+    Identical bytes map to the same key, so re-uploads of a photo share one
+    file. The key is what lost_items.image_url stores; users.profile_image
+    stores it with the 'uploads/' prefix.
+    """
+    tmp_path, ext, digest = receive_image(file_storage, UPLOAD_ROOT, max_bytes)
+    key = f"{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+    target = _key_path(key)
+    try:
+        with _key_lock(key):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if os.path.exists(target):
+                # Duplicate content: keep the existing file, refresh it for the GC grace period
+                os.utime(target)
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return key
+
+
+def count_references(key, cursor=None):
+    """Number of items and users pointing at a stored image"""
+    own_cursor = cursor is None
+    if own_cursor:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+    forms = (key, f"uploads/{key}")
+    cursor.execute('''
+        SELECT (SELECT COUNT(*) FROM lost_items WHERE image_url IN (%s, %s))
+             + (SELECT COUNT(*) FROM users WHERE profile_image IN (%s, %s)) as refs
+    ''', forms + forms)
+    refs = cursor.fetchone()['refs']
+    if own_cursor:
+        cursor.close()
+        conn.close()
+    return refs
+
+
+def _remove_files(key):
+    paths = [_key_path(key)]
+    for rendition in RENDITIONS:
+        for fmt in (None, 'webp'):
+            paths.append(os.path.join(STATIC_FOLDER, rendition_path(key, rendition, fmt)))
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _recently_touched(key):
+    try:
+        return time.time() - os.path.getmtime(_key_path(key)) < GC_GRACE_SECONDS
+    except FileNotFoundError:
+        return False
+
+
+def _remove_if_unreferenced(key):
+    """Delete a stored image unless it is referenced or was touched recently"""
+    with _key_lock(key) as (conn, cursor):
+        # A store_image() before us refreshed the file; one after us waits and
+        # writes the file again. End any open snapshot so the count is current.
+        conn.commit()
+        if _recently_touched(key) or count_references(key, cursor) > 0:
+            return False
+        _remove_files(key)
+    return True
+
+
+def release_image(image_url):
+    """Delete a stored image (and its renditions) once nothing references it.
+
+    Call after the row that pointed at it was deleted or changed. Images in
+    the old, non content addressed layout are left alone.
+    """
+    key = image_key(image_url)
+    if key is None:
+        return False
+    return _remove_if_unreferenced(key)
+
+
+def collect_orphans(verbose=True):
+    """Sweep the whole store and delete images no row references any more"""
+    removed = 0
+    for shard in sorted(os.listdir(UPLOAD_ROOT)):
+        shard_dir = os.path.join(UPLOAD_ROOT, shard)
+        if len(shard) != 2 or not os.path.isdir(shard_dir):
+            continue
+        for sub in sorted(os.listdir(shard_dir)):
+            for filename in sorted(os.listdir(os.path.join(shard_dir, sub))):
+                key = f"{shard}/{sub}/{filename}"
+                if not _KEY_RE.match(key) or _recently_touched(key):
+                    continue
+                if _remove_if_unreferenced(key):
+                    removed += 1
+                    if verbose:
+                        print(f"Removed orphaned image {key}")
+    return removed
@@ -0,0 +1,130 @@
+import os
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import url_for, current_app
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional, templates then fall back to the originals
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Rendition name -> bounding box in pixels
+RENDITIONS = {
+    'avatar': (150, 150),
+    'card': (400, 400),
+    'detail': (1000, 1000),
+}
+RENDITIONS_DIR = 'uploads/renditions'
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+WORKERS = 2
+# Renditions are served as static files, possibly by another server
+RENDITION_FILE_MODE = 0o644
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def to_static_path(image_url):
+    """Path of an uploaded image relative to static/ (old rows omit 'uploads/')"""
+    if image_url.startswith('uploads/'):
+        return image_url
+    return 'uploads/' + image_url
+
+
+def rendition_path(image_url, rendition, fmt=None):
+    """Path relative to static/ of one rendition of an uploaded image"""
+    relative = to_static_path(image_url)[len('uploads/'):]
+    stem, ext = os.path.splitext(relative)
+    if fmt == 'webp':
+        ext = '.webp'
+    elif ext.lower() == '.gif':
+        ext = '.png'  # animated GIFs are flattened to their first frame
+    return f"{RENDITIONS_DIR}/{stem}_{rendition}{ext}"
+
+
+def generate_renditions(static_folder, image_url):
+    """Write every rendition (original format + WebP) of one uploaded image"""
+    if Image is None:
+        return
+    targets = [os.path.join(static_folder, rendition_path(image_url, rendition, fmt))
+               for rendition in RENDITIONS for fmt in (None, 'webp')]
+    if all(os.path.exists(target) for target in targets):
+        return  # Same content was uploaded before
+    source = os.path.join(static_folder, to_static_path(image_url))
+    with Image.open(source) as original:
+        original = ImageOps.exif_transpose(original)
+        has_alpha = original.mode in ('RGBA', 'LA', 'P')
+        for rendition, size in RENDITIONS.items():
+            image = original.copy()
+            image.thumbnail(size)
+            for fmt in (None, 'webp'):
+                target = os.path.join(static_folder, rendition_path(image_url, rendition, fmt))
+                _save(image, target, fmt, has_alpha)
+
+
+def _save(image, target, fmt, has_alpha):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    ext = os.path.splitext(target)[1].lower()
+    # A temp file of its own, as the same content can be rendered twice at once
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            if fmt == 'webp':
+                image.save(out, 'WEBP', quality=WEBP_QUALITY)
+            elif ext in ('.jpg', '.jpeg'):
+                if has_alpha or image.mode != 'RGB':
+                    image = image.convert('RGB')
+                image.save(out, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+            else:
+                image.save(out, 'PNG', optimize=True)
+        os.chmod(tmp, RENDITION_FILE_MODE)
+        # Atomic so a request never sees a half written file
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def schedule_renditions(static_folder, image_url):
+    """Generate renditions in the background so the upload request returns at once"""
+    global _executor
+    if Image is None or not image_url:
+        return None
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='renditions')
+    future = _executor.submit(generate_renditions, static_folder, image_url)
+    future.add_done_callback(_log_failure)
+    return future
+
+
+def _log_failure(future):
+    if future.exception() is not None:
+        logger.error("Generating image renditions failed: %s", future.exception())
+
+
+def _rendition_url(image_url, rendition, fmt):
+    # Checked on every call rather than remembered: renditions are deleted
+    # together with their image, possibly by another worker process
+    path = rendition_path(image_url, rendition, fmt)
+    if not os.path.exists(os.path.join(current_app.static_folder, path)):
+        return None
+    return url_for('static', filename=path)
+
+
+def image_src(image_url, rendition='card'):
+    """Template helper: URL of the rendition, or of the original until it exists"""
+    return (_rendition_url(image_url, rendition, None)
+            or url_for('static', filename=to_static_path(image_url)))
+
+
+def image_webp(image_url, rendition='card'):
+    """Template helper: URL of the WebP rendition, or None if not generated yet"""
+    return _rendition_url(image_url, rendition, 'webp')
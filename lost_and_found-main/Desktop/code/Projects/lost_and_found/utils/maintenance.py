@@ -0,0 +1,111 @@
+import os
+import time
+import logging
+import threading
+from models.database import get_db_connection
+from utils.otp import otp_util
+from utils.otp_store import SQLOTPStore
+
+logger = logging.getLogger(__name__)
+
+# Rows deleted per statement and pause between statements, so a purge never
+# holds locks for long or floods replication
+PURGE_BATCH_SIZE = 1000
+PURGE_BATCH_PAUSE = 0.1
+
+# Approved email / phone changes are kept this long for the admin history;
+# requests nobody approved are dropped after PENDING_CHANGE_EXPIRY_DAYS
+PENDING_CHANGE_RETENTION_DAYS = int(os.environ.get('PENDING_CHANGE_RETENTION_DAYS', 30))
+PENDING_CHANGE_EXPIRY_DAYS = int(os.environ.get('PENDING_CHANGE_EXPIRY_DAYS', 90))
+
+# Seconds between runs of the in-app maintenance thread; 0 leaves it off
+# (run "python maintenance.py" from cron instead)
+MAINTENANCE_INTERVAL = int(os.environ.get('MAINTENANCE_INTERVAL', 0))
+
+# Only one process purges at a time, the others skip the run
+MAINTENANCE_LOCK = 'lost_and_found.maintenance'
+
+_thread = None
+
+
+def purge_in_batches(table, condition, params=(), batch_size=PURGE_BATCH_SIZE, pause=PURGE_BATCH_PAUSE):
+    """DELETE matching rows at most ``batch_size`` at a time; returns rows deleted"""
+    total = 0
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        while True:
+            cursor.execute(f'DELETE FROM {table} WHERE {condition} LIMIT %s', tuple(params) + (batch_size,))
+            deleted = cursor.rowcount
+            conn.commit()
+            total += deleted
+            if deleted < batch_size:
+                break
+            time.sleep(pause)
+    finally:
+        cursor.close()
+        conn.close()
+    return total
+
+
+def purge_expired_otps():
+    """Drop OTPs past their TTL from whichever store is configured"""
+    store = otp_util.store
+    if isinstance(store, SQLOTPStore):
+        return purge_in_batches('otp_verifications', 'created_at < NOW() - INTERVAL %s SECOND', (store.ttl,))
+    return store.purge_expired()
+
+
+def purge_pending_changes(table):
+    """Drop old approved changes and requests that were never approved"""
+    approved = purge_in_batches(
+        table, 'approved = TRUE AND approved_at < NOW() - INTERVAL %s DAY',
+        (PENDING_CHANGE_RETENTION_DAYS,))
+    expired = purge_in_batches(
+        table, 'approved = FALSE AND requested_at < NOW() - INTERVAL %s DAY',
+        (PENDING_CHANGE_EXPIRY_DAYS,))
+    return approved + expired
+
+
+def run_maintenance():
+    """Run every purge once and return {table: rows purged}, or None if another process is running it"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT GET_LOCK(%s, 0) AS locked', (MAINTENANCE_LOCK,))
+    if not cursor.fetchone()['locked']:
+        cursor.close()
+        conn.close()
+        return None
+
+    try:
+        counts = {
+            'otp_verifications': purge_expired_otps(),
+            'pending_email_changes': purge_pending_changes('pending_email_changes'),
+            'pending_phone_changes': purge_pending_changes('pending_phone_changes'),
+        }
+    finally:
+        cursor.execute('SELECT RELEASE_LOCK(%s)', (MAINTENANCE_LOCK,))
+        cursor.close()
+        conn.close()
+
+    logger.info("Maintenance purged %s", ', '.join(f"{n} from {t}" for t, n in counts.items()))
+    return counts
+
+
+def _loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            run_maintenance()
+        except Exception:
+            logger.exception("Maintenance run failed")
+
+
+def start_maintenance_thread(interval=MAINTENANCE_INTERVAL):
+    """Run the purges every ``interval`` seconds in a daemon thread (no-op if interval is 0)"""
+    global _thread
+    if interval <= 0 or _thread is not None:
+        return None
+    _thread = threading.Thread(target=_loop, args=(interval,), name='maintenance', daemon=True)
+    _thread.start()
+    return _thread
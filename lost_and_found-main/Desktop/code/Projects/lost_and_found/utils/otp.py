@@ -1,15 +1,15 @@
-from models.database import get_db_connection
-import pymysql.cursors
+from utils.otp_store import create_otp_store
+from utils.executor import get_executor
 import secrets
 import string
-import threading
 import time
 
 class OTPUtil:
     """OTP utility class with threading support"""
     
-    def __init__(self):
-        pass
+    def __init__(self, store=None):
+        # Backend selected by OTP_BACKEND (sql, memory or local)
+        self.store = store or create_otp_store()
     
     def generate_otp(self, length=6):
         """Generate a random OTP of specified length"""
@@ -17,95 +17,47 @@ class OTPUtil:
         return ''.join(secrets.choice(characters) for _ in range(length))
     
     def store_otp(self, phone=None, email=None, otp=None):
-        """Store OTP in database for phone or email"""
+        """Store OTP for phone or email (replacing any previous one)"""
         if not otp:
             otp = self.generate_otp()
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Remove existing OTP for this phone/email
         if phone:
-            cursor.execute("DELETE FROM otp_verifications WHERE phone = %s", (phone,))
-        if email:
-            cursor.execute("DELETE FROM otp_verifications WHERE email = %s", (email,))
-        
-        # Store new OTP - handle cases where phone or email might be None
-        if phone and email:
-            cursor.execute('''
-                INSERT INTO otp_verifications (phone, email, otp) 
-                VALUES (%s, %s, %s)
-            ''', (phone, email, otp))
-        elif phone:
-            cursor.execute('''
-                INSERT INTO otp_verifications (phone, email, otp) 
-                VALUES (%s, NULL, %s)
-            ''', (phone, otp))
+            self.store.put('phone', phone, otp)
         elif email:
-            cursor.execute('''
-                INSERT INTO otp_verifications (phone, email, otp) 
-                VALUES (NULL, %s, %s)
-            ''', (email, otp))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+            self.store.put('email', email, otp)
         
         return otp
     
     def verify_otp(self, phone=None, email=None, otp=None):
-        """Verify OTP for phone or email"""
+        """Verify and consume an unexpired OTP for phone or email"""
         if not otp:
             return False
         
-        conn = get_db_connection()
-        cursor = conn.cursor(pymysql.cursors.DictCursor)
-        
         if phone:
-            cursor.execute('''
-                SELECT * FROM otp_verifications 
-                WHERE phone = %s AND otp = %s
-            ''', (phone, otp))
+            return self.store.consume('phone', phone, otp)
         elif email:
-            cursor.execute('''
-                SELECT * FROM otp_verifications 
-                WHERE email = %s AND otp = %s
-            ''', (email, otp))
-        else:
-            cursor.close()
-            conn.close()
-            return False
-        
-        otp_record = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        
-        # Remove the OTP after verification (one-time use)
-        if otp_record:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            if phone:
-                cursor.execute("DELETE FROM otp_verifications WHERE phone = %s", (phone,))
-            elif email:
-                cursor.execute("DELETE FROM otp_verifications WHERE email = %s", (email,))
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return True
-        
+            return self.store.consume('email', email, otp)
         return False
     
+    def otp_issued_at(self, phone=None, email=None):
+        """When the current OTP was issued (for resend cooldowns), or None"""
+        if phone:
+            return self.store.issued_at('phone', phone)
+        elif email:
+            return self.store.issued_at('email', email)
+        return None
+    
     def resend_otp_threaded(self, phone=None, email=None):
-        """Resend OTP using threading for better performance"""
+        """Resend OTP on the shared background pool; returns a Future for the OTP.
+
+        Raises ExecutorRejected when the pool's queue is full.
+        """
         def resend_task():
             otp = self.generate_otp()
             self.store_otp(phone=phone, email=email, otp=otp)
             return otp
         
-        # Create and start thread
-        thread = threading.Thread(target=resend_task)
-        thread.start()
-        return thread
+        return get_executor().submit(resend_task)
 
 # Create a global instance
 otp_util = OTPUtil()
@@ -113,4 +65,5 @@ otp_util = OTPUtil()
 # Export functions for backward compatibility
 generate_otp = otp_util.generate_otp
 store_otp = otp_util.store_otp
-verify_otp = otp_util.verify_otp
\ No newline at end of file
+verify_otp = otp_util.verify_otp
+otp_issued_at = otp_util.otp_issued_at
\ No newline at end of file
@@ -0,0 +1,247 @@
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from models.database import get_db_connection
+
+# Which backend keeps OTPs: 'sql' (MySQL otp_verifications table), 'memory'
+# (this process only) or 'local' (SQLite file shared by workers on one host)
+OTP_BACKEND = os.environ.get('OTP_BACKEND', 'sql')
+OTP_LOCAL_PATH = os.environ.get('OTP_LOCAL_PATH', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'otp_store.sqlite3'))
+
+# How long an OTP stays valid
+OTP_TTL_SECONDS = 10 * 60
+
+# Limits for the in-process store
+MEMORY_MAX_ENTRIES = 10000
+MEMORY_SWEEP_INTERVAL = 30
+
+KINDS = ('phone', 'email')
+
+
+class OTPStore(ABC):
+    """Where OTPs live. ``kind`` is 'phone' or 'email', ``value`` the address"""
+
+    def __init__(self, ttl=OTP_TTL_SECONDS):
+        self.ttl = ttl
+
+    @abstractmethod
+    def put(self, kind, value, otp):
+        """Store an OTP, replacing any previous one for the same address"""
+
+    @abstractmethod
+    def consume(self, kind, value, otp):
+        """Atomically check and delete an unexpired OTP; True if it matched"""
+
+    @abstractmethod
+    def issued_at(self, kind, value):
+        """When the current OTP for an address was issued (datetime), or None"""
+
+    @abstractmethod
+    def purge_expired(self):
+        """Drop expired OTPs and return how many were removed"""
+
+
+class MemoryOTPStore(OTPStore):
+    """Expiring dict in this process; a background thread sweeps expired entries.
+
+    Only suitable for a single worker process: other workers can't see the
+    OTPs stored here.
+    """
+
+    def __init__(self, ttl=OTP_TTL_SECONDS, max_entries=MEMORY_MAX_ENTRIES,
+                 sweep_interval=MEMORY_SWEEP_INTERVAL):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self._entries = OrderedDict()  # (kind, value) -> (otp, issued_at, expires_at); oldest first
+        self._lock = threading.Lock()
+        self._sweeper = None
+
+    def put(self, kind, value, otp):
+        self._start_sweeper()
+        key = (kind, value)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (otp, datetime.now(), time.monotonic() + self.ttl)
+            # Over the cap: drop the oldest OTPs first
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def consume(self, kind, value, otp):
+        key = (kind, value)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] <= time.monotonic() or entry[0] != otp:
+                return False
+            del self._entries[key]
+            return True
+
+    def issued_at(self, kind, value):
+        with self._lock:
+            entry = self._entries.get((kind, value))
+        if entry is None or entry[2] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def purge_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if entry[2] <= now]
+            for key in expired:
+                del self._entries[key]
+        return len(expired)
+
+    def _start_sweeper(self):
+        if self._sweeper is not None:
+            return
+        with self._lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep, name='otp-sweeper', daemon=True)
+                self._sweeper.start()
+
+    def _sweep(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            self.purge_expired()
+
+
+class SQLOTPStore(OTPStore):
+    """OTPs in the otp_verifications table (one row per phone / email)"""
+
+    @staticmethod
+    def _column(kind):
+        # kind is interpolated as a column name, never let anything else through
+        if kind not in KINDS:
+            raise ValueError(f"Unknown OTP kind {kind!r}")
+        return kind
+
+    def put(self, kind, value, otp):
+        kind = self._column(kind)
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        # Upsert keyed on the unique phone / email columns: one statement instead of DELETE + INSERT
+        cursor.execute(f'''
+            INSERT INTO otp_verifications ({kind}, otp)
+            VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE otp = VALUES(otp), created_at = CURRENT_TIMESTAMP
+        ''', (value, otp))
+
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+    def consume(self, kind, value, otp):
+        kind = self._column(kind)
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        # Check and consume in one atomic statement: an OTP can only be used once
+        cursor.execute(f'''
+            DELETE FROM otp_verifications
+            WHERE {kind} = %s AND otp = %s
+            AND created_at > NOW() - INTERVAL %s SECOND
+        ''', (value, otp, self.ttl))
+        consumed = cursor.rowcount == 1
+
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return consumed
+
+    def issued_at(self, kind, value):
+        kind = self._column(kind)
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT created_at FROM otp_verifications
+            WHERE {kind} = %s AND created_at > NOW() - INTERVAL %s SECOND
+        ''', (value, self.ttl))
+        row = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        return row['created_at'] if row else None
+
+    def purge_expired(self):
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM otp_verifications WHERE created_at < NOW() - INTERVAL %s SECOND',
+                       (self.ttl,))
+        purged = cursor.rowcount
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return purged
+
+
+class LocalKVOTPStore(OTPStore):
+    """OTPs in a local SQLite file: a key-value stand-in shared by every worker on one host"""
+
+    def __init__(self, path=OTP_LOCAL_PATH, ttl=OTP_TTL_SECONDS):
+        super().__init__(ttl)
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS otps (
+                key TEXT PRIMARY KEY,
+                otp TEXT NOT NULL,
+                issued_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_otps_expires_at ON otps(expires_at)')
+
+    def _connect(self):
+        # One connection per thread; autocommit, WAL so workers don't block each other
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _key(kind, value):
+        return f"{kind}:{value}"
+
+    def put(self, kind, value, otp):
+        now = time.time()
+        self._connect().execute(
+            'INSERT OR REPLACE INTO otps (key, otp, issued_at, expires_at) VALUES (?, ?, ?, ?)',
+            (self._key(kind, value), otp, now, now + self.ttl))
+
+    def consume(self, kind, value, otp):
+        cursor = self._connect().execute(
+            'DELETE FROM otps WHERE key = ? AND otp = ? AND expires_at > ?',
+            (self._key(kind, value), otp, time.time()))
+        return cursor.rowcount == 1
+
+    def issued_at(self, kind, value):
+        row = self._connect().execute(
+            'SELECT issued_at FROM otps WHERE key = ? AND expires_at > ?',
+            (self._key(kind, value), time.time())).fetchone()
+        return datetime.fromtimestamp(row[0]) if row else None
+
+    def purge_expired(self):
+        cursor = self._connect().execute('DELETE FROM otps WHERE expires_at <= ?', (time.time(),))
+        return cursor.rowcount
+
+
+_BACKENDS = {
+    'sql': SQLOTPStore,
+    'memory': MemoryOTPStore,
+    'local': LocalKVOTPStore,
+}
+
+
+def create_otp_store(backend=OTP_BACKEND):
+    """Build the OTP store selected by OTP_BACKEND"""
+    try:
+        return _BACKENDS[backend]()
+    except KeyError:
+        raise ValueError(f"Unknown OTP backend {backend!r}, expected one of {', '.join(_BACKENDS)}")
@@ -0,0 +1,208 @@
+import os
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, session
+from flask_socketio import emit
+from werkzeug.exceptions import TooManyRequests
+
+# Where bucket state lives: 'memory' (this process only) or 'local' (SQLite
+# file shared by every worker on one host)
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_LOCAL_PATH = os.environ.get('RATE_LIMIT_LOCAL_PATH', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'rate_limit.sqlite3'))
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+
+MEMORY_MAX_BUCKETS = 100000
+
+
+class RateLimitExceeded(TooManyRequests):
+    """Raised when a bucket is empty; rendered as HTTP 429 with Retry-After"""
+
+    def __init__(self, limit, retry_after):
+        super().__init__(f"Too many requests. Please try again in {retry_after} seconds.")
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+class MemoryBucketStore:
+    """Token buckets in this process, least recently used evicted past max_buckets"""
+
+    def __init__(self, max_buckets=MEMORY_MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, cost=1):
+        """Take ``cost`` tokens; returns seconds to wait (0 when allowed)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0
+            else:
+                wait = (cost - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def reset(self, key=None):
+        with self._lock:
+            if key is None:
+                self._buckets.clear()
+            else:
+                self._buckets.pop(key, None)
+
+
+class LocalBucketStore:
+    """Token buckets in a local SQLite file, shared by every worker on one host"""
+
+    def __init__(self, path=RATE_LIMIT_LOCAL_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._connect().execute('''
+            CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+
+    def _connect(self):
+        # One connection per thread; autocommit, WAL so workers don't block each other
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, capacity, rate, cost=1):
+        conn = self._connect()
+        now = time.time()
+        # IMMEDIATE takes the write lock up front so read-modify-write is atomic across processes
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated_at FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens, updated_at = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0, now - updated_at) * rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0
+            else:
+                wait = (cost - tokens) / rate
+            conn.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)',
+                         (key, tokens, now))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def reset(self, key=None):
+        if key is None:
+            self._connect().execute('DELETE FROM buckets')
+        else:
+            self._connect().execute('DELETE FROM buckets WHERE key = ?', (key,))
+
+
+_BACKENDS = {
+    'memory': MemoryBucketStore,
+    'local': LocalBucketStore,
+}
+
+
+def create_bucket_store(backend=RATE_LIMIT_BACKEND):
+    """Build the bucket store selected by RATE_LIMIT_BACKEND"""
+    try:
+        return _BACKENDS[backend]()
+    except KeyError:
+        raise ValueError(f"Unknown rate limit backend {backend!r}, expected one of {', '.join(_BACKENDS)}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_bucket_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_bucket_store()
+    return _store
+
+
+class RateLimit:
+    """``capacity`` requests in a burst, refilled at ``capacity`` per ``per_seconds``"""
+
+    def __init__(self, name, capacity, per_seconds, store=None):
+        self.name = name
+        self.capacity = capacity
+        self.rate = capacity / per_seconds
+        self.store = store
+
+    def hit(self, key, cost=1):
+        """Spend a token for ``key``; returns seconds until allowed (0 if allowed now)"""
+        if not RATE_LIMIT_ENABLED or key is None:
+            return 0
+        store = self.store or get_bucket_store()
+        return store.take(f"{self.name}:{key}", self.capacity, self.rate, cost)
+
+    def check(self, key, cost=1):
+        """Like hit() but raises RateLimitExceeded when the bucket is empty"""
+        wait = self.hit(key, cost)
+        if wait > 0:
+            raise RateLimitExceeded(self, math.ceil(wait))
+
+
+# Limits used by the app
+LOGIN_LIMIT = RateLimit('login', 10, 60)            # per IP
+OTP_SEND_LIMIT = RateLimit('otp_send', 5, 10 * 60)  # per phone / email
+CHAT_MESSAGE_LIMIT = RateLimit('chat', 20, 10)      # per user
+
+
+def client_ip():
+    """Key function: the client's address"""
+    return request.remote_addr
+
+
+def session_user():
+    """Key function: the logged in user, or the client's address for anonymous requests"""
+    user_id = session.get('user_id')
+    return f"user:{user_id}" if user_id else f"ip:{request.remote_addr}"
+
+
+def rate_limited(limit, key=client_ip, methods=('POST',)):
+    """Flask view decorator: raise RateLimitExceeded (HTTP 429) once ``limit`` is used up.
+
+    Only requests whose method is in ``methods`` spend tokens, so showing a
+    form is never throttled.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method in methods:
+                limit.check(key())
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def socket_rate_limited(limit, key=session_user):
+    """Socket.IO handler decorator: emit an 'error' event instead of running the handler"""
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(*args, **kwargs):
+            wait = limit.hit(key())
+            if wait > 0:
+                emit('error', {'msg': f'You are sending messages too fast. Please wait {math.ceil(wait)} seconds.'})
+                return None
+            return handler(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,39 @@
+import re
+
+# InnoDB ignores tokens shorter than innodb_ft_min_token_size (3 by default)
+MIN_TOKEN_LENGTH = 3
+MAX_TOKENS = 10
+
+# InnoDB's default full-text stopwords: never indexed, so a required (+) term
+# made of one would match nothing
+STOPWORDS = frozenset((
+    'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en', 'for',
+    'from', 'how', 'i', 'in', 'is', 'it', 'la', 'of', 'on', 'or', 'that', 'the',
+    'this', 'to', 'was', 'what', 'when', 'where', 'who', 'will', 'with', 'und', 'www',
+))
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Split free text into lowercase search tokens, dropping duplicates, stopwords and short words"""
+    tokens = []
+    for token in _TOKEN_RE.findall((text or '').lower()):
+        if len(token) >= MIN_TOKEN_LENGTH and token not in STOPWORDS and token not in tokens:
+            tokens.append(token)
+    return tokens[:MAX_TOKENS]
+
+
+def boolean_query(text, prefix=True):
+    """Build a BOOLEAN MODE AGAINST() string requiring every token.
+
+    With ``prefix`` each token also matches longer words ("lap" finds
+    "laptop"). Returns None when no usable token is left. Boolean operators
+    typed by the user are stripped by tokenize(), so the result is safe to
+    pass as a query parameter.
+    """
+    tokens = tokenize(text)
+    if not tokens:
+        return None
+    suffix = '*' if prefix else ''
+    return ' '.join(f'+{token}{suffix}' for token in tokens)
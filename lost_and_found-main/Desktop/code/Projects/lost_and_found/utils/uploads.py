@@ -0,0 +1,86 @@
+import os
+import hashlib
+import tempfile
+from flask import request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+# Hard ceiling for any request body; Werkzeug refuses larger bodies before parsing
+MAX_CONTENT_LENGTH = 10 * 1024 * 1024
+
+# Per endpoint limits for uploaded images
+ITEM_IMAGE_MAX_BYTES = 5 * 1024 * 1024
+PROFILE_IMAGE_MAX_BYTES = 2 * 1024 * 1024
+
+CHUNK_SIZE = 64 * 1024
+
+# mkstemp creates files readable by the owner only; uploads are served as
+# static files, possibly by another server, so they get the usual mode
+UPLOAD_FILE_MODE = 0o644
+
+# Leading bytes of the accepted image types -> extension we store them with
+IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'GIF87a', '.gif'),
+    (b'GIF89a', '.gif'),
+]
+
+
+class UploadError(Exception):
+    """Raised when an uploaded file is rejected; the message is shown to the user"""
+    pass
+
+
+def enforce_upload_limit(max_bytes):
+    """Reject the request from its Content-Length before the body is parsed.
+
+    Must be called before request.form / request.files are touched. The
+    form overhead on top of the file is small, so a little slack is allowed.
+    """
+    if request.content_length is not None and request.content_length > max_bytes + CHUNK_SIZE:
+        raise RequestEntityTooLarge()
+
+
+def detect_image_type(head):
+    """Return the extension matching the file's magic bytes, or None"""
+    for signature, ext in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    return None
+
+
+def receive_image(file_storage, directory, max_bytes):
+    """Stream an uploaded image into a temp file inside ``directory``.
+
+    The file is copied in chunks and hashed on the way, its real type is
+    taken from the magic bytes (not the client's filename), and copying
+    stops as soon as ``max_bytes`` is exceeded. Returns
+    (temp_path, extension, sha256 hexdigest); the caller moves the temp file
+    into place. Raises UploadError when the file is too large or not a
+    supported image.
+    """
+    os.makedirs(directory, exist_ok=True)
+    stream = file_storage.stream
+    head = stream.read(CHUNK_SIZE)
+    ext = detect_image_type(head)
+    if ext is None:
+        raise UploadError('Only PNG, JPEG and GIF images are allowed.')
+
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    try:
+        os.chmod(tmp_path, UPLOAD_FILE_MODE)
+        size = 0
+        with os.fdopen(fd, 'wb') as tmp:
+            chunk = head
+            while chunk:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadError(f'Image is too large (max {max_bytes // (1024 * 1024)} MB).')
+                digest.update(chunk)
+                tmp.write(chunk)
+                chunk = stream.read(CHUNK_SIZE)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, ext, digest.hexdigest()
@@ -31,6 +31,9 @@ DB_CONFIG = {
     'charset': 'utf8mb4'
 }
 
+# Items per page on the home page
+ITEMS_PER_PAGE = 20
+
 # Image upload configuration
 UPLOAD_FOLDER = 'static/uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
@@ -183,18 +186,38 @@ def index():
         query += " AND li.category = %s"
         params.append(category_filter)
     
-    # Add location filter if provided (case-insensitive)
+    # Add location filter if provided (the column collation is already case-insensitive,
+    # wrapping it in UPPER() would rule out any index on it)
     if location_filter:
-        query += " AND UPPER(li.location_lost) LIKE UPPER(%s)"
+        query += " AND li.location_lost LIKE %s"
         params.append(f"%{location_filter}%")
     
-    query += " ORDER BY li.created_at DESC"
+    # Keyset pagination on (created_at, id): deep pages cost the same as the first
+    page_cursor = request.args.get('cursor', '')
+    if page_cursor:
+        try:
+            cursor_created_at, cursor_id = page_cursor.split('_')
+            cursor_created_at = datetime.fromisoformat(cursor_created_at)
+            cursor_id = int(cursor_id)
+            query += " AND (li.created_at < %s OR (li.created_at = %s AND li.id < %s))"
+            params.extend([cursor_created_at, cursor_created_at, cursor_id])
+        except ValueError:
+            pass  # Malformed cursor, show the first page
+    
+    query += " ORDER BY li.created_at DESC, li.id DESC LIMIT %s"
+    params.append(ITEMS_PER_PAGE + 1)
     
     cursor.execute(query, params)
     lost_items = cursor.fetchall()
     cursor.close()
     conn.close()
     
+    next_cursor = None
+    if len(lost_items) > ITEMS_PER_PAGE:
+        lost_items = lost_items[:ITEMS_PER_PAGE]
+        last_item = lost_items[-1]
+        next_cursor = f"{last_item['created_at'].isoformat()}_{last_item['id']}"
+    
     # Get distinct categories and locations for filter dropdowns
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -210,7 +233,7 @@ def index():
     return render_template('index.html', items=lost_items, user=get_current_user(), 
                           is_admin=is_admin, is_main_admin=is_main_admin,
                           category_filter=category_filter, location_filter=location_filter,
-                          categories=categories, locations=locations)
+                          categories=categories, locations=locations, next_cursor=next_cursor)
 
 @app.route('/register', methods=['GET', 'POST'])
 def register():
@@ -1,29 +1,59 @@
 """
 Mock SMS service for sending OTPs.
 In a real implementation, this would integrate with an actual SMS provider like Twilio.
+
+Messages are not sent in the request: send_otp_sms() puts them on an outbound
+queue and background workers deliver them in batches, retrying transient
+failures with exponential backoff. A newer message to a phone that still has
+one waiting replaces it, and an identical message sent within the coalescing
+window is dropped, so repeated "resend" clicks turn into one SMS.
+
+The provider is a pluggable transport: LoggingTransport (default) prints the
+messages, FakeTransport records them for tests. Use configure() to swap it.
 """
 
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import atexit
+import heapq
+from abc import ABC, abstractmethod
+import itertools
 import logging
+import random
+import threading
+import time
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Outbound queue settings
+SMS_WORKERS = 2
+SMS_MAX_QUEUE = 1000
+SMS_BATCH_SIZE = 50          # messages per provider call
+SMS_BATCH_WAIT = 0.2         # seconds to wait for a batch to fill up
+SMS_COALESCE_WINDOW = 30     # seconds an identical message to a phone is deduplicated
+SMS_MAX_RETRIES = 5
+SMS_BACKOFF_BASE = 0.5       # seconds, doubled per attempt
+SMS_BACKOFF_MAX = 30
+SMS_SHUTDOWN_TIMEOUT = 10
+
+
+def is_valid_phone(phone):
+    """Phone numbers are stored in +91XXXXXXXXXX format"""
+    return bool(phone) and phone.startswith('+91') and len(phone) == 13
+
+
 def send_sms_via_email(phone, message):
     """
     Send SMS via email-to-SMS gateway.
     This is a mock implementation that just prints to console.
     In a real implementation, you would use an SMS service provider.
-    
+
     Args:
         phone (str): Phone number in +91 format
         message (str): Message to send
     """
     # Extract the 10-digit number from +91 format
-    if phone.startswith('+91') and len(phone) == 13:
+    if is_valid_phone(phone):
         phone_number = phone[3:]  # Remove +91 prefix
         logger.info(f"Sending SMS to {phone}: {message}")
         print(f"SMS sent to {phone}: {message}")
@@ -32,18 +62,317 @@ def send_sms_via_email(phone, message):
         logger.error(f"Invalid phone number format: {phone}")
         return False
 
+
+class TransientSMSError(Exception):
+    """Raised by a transport when a send may succeed if retried (timeouts, 5xx, throttling)"""
+    pass
+
+
+class SMSQueueFull(Exception):
+    """Raised when the outbound queue is at capacity"""
+    pass
+
+
+class SMSTransport(ABC):
+    """Delivers a batch of messages in one provider call.
+
+    send_batch() gets a list of (phone, message) pairs and returns one result
+    per pair: True when sent, False when the provider refused it for good
+    (e.g. invalid number). Raise TransientSMSError, or return a
+    TransientSMSError in place of a result, for sends worth retrying.
+    """
+
+    @abstractmethod
+    def send_batch(self, messages):
+        """Send every (phone, message) pair; returns one result per pair"""
+
+
+class LoggingTransport(SMSTransport):
+    """Development transport: logs and prints every message"""
+
+    def send_batch(self, messages):
+        return [send_sms_via_email(phone, message) for phone, message in messages]
+
+
+class FakeTransport(SMSTransport):
+    """Records messages instead of sending them; can simulate provider failures"""
+
+    def __init__(self, fail_times=0):
+        self.fail_times = fail_times  # number of calls that raise TransientSMSError
+        self.sent = []                # (phone, message) in delivery order
+        self.calls = []               # batch size of every call, including failed ones
+        self._lock = threading.Lock()
+
+    def send_batch(self, messages):
+        with self._lock:
+            self.calls.append(len(messages))
+            if self.fail_times > 0:
+                self.fail_times -= 1
+                raise TransientSMSError('Simulated provider failure')
+            results = []
+            for phone, message in messages:
+                if is_valid_phone(phone):
+                    self.sent.append((phone, message))
+                    results.append(True)
+                else:
+                    results.append(False)
+            return results
+
+    def messages_for(self, phone):
+        with self._lock:
+            return [message for sent_phone, message in self.sent if sent_phone == phone]
+
+
+class OutboundSMS:
+    """One queued message"""
+
+    def __init__(self, phone, message):
+        self.phone = phone
+        self.message = message
+        self.attempts = 0
+        self.enqueued_at = time.monotonic()
+
+
+class SMSQueue:
+    """Outbound SMS queue delivered by background worker threads"""
+
+    def __init__(self, transport, workers=SMS_WORKERS, max_queue=SMS_MAX_QUEUE,
+                 batch_size=SMS_BATCH_SIZE, batch_wait=SMS_BATCH_WAIT,
+                 coalesce_window=SMS_COALESCE_WINDOW, max_retries=SMS_MAX_RETRIES,
+                 backoff_base=SMS_BACKOFF_BASE, backoff_max=SMS_BACKOFF_MAX):
+        self.transport = transport
+        self.workers = workers
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.coalesce_window = coalesce_window
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._cond = threading.Condition()
+        self._heap = []        # (due, seq, OutboundSMS), earliest first
+        self._seq = itertools.count()
+        self._waiting = {}     # phone -> OutboundSMS not yet handed to the provider
+        self._recent = {}      # phone -> (message, sent_at) for deduplication
+        self._in_flight = 0
+        self._threads = []
+        self._stopping = False
+        self.stats = {'queued': 0, 'coalesced': 0, 'sent': 0, 'failed': 0,
+                      'retried': 0, 'rejected': 0, 'batches': 0}
+
+    def enqueue(self, phone, message):
+        """Queue a message; returns False if it was merged into or deduplicated against another one"""
+        now = time.monotonic()
+        with self._cond:
+            if self._stopping:
+                raise SMSQueueFull('SMS queue is shut down')
+
+            waiting = self._waiting.get(phone)
+            if waiting is not None:
+                # Only the newest text matters (a resend makes the old OTP invalid)
+                waiting.message = message
+                self.stats['coalesced'] += 1
+                return False
+
+            recent = self._recent.get(phone)
+            if recent and recent[0] == message and now - recent[1] < self.coalesce_window:
+                self.stats['coalesced'] += 1
+                return False
+
+            if len(self._waiting) >= self.max_queue:
+                self.stats['rejected'] += 1
+                raise SMSQueueFull('SMS queue is full')
+
+            sms = OutboundSMS(phone, message)
+            self._push(sms, now)
+            self.stats['queued'] += 1
+            self._start_workers()
+            self._cond.notify()
+            return True
+
+    def _push(self, sms, due):
+        # Called with the lock held
+        self._waiting[sms.phone] = sms
+        heapq.heappush(self._heap, (due, next(self._seq), sms))
+
+    def _start_workers(self):
+        # Called with the lock held; threads are started on the first message
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker, name=f"sms-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _take_batch(self):
+        """Block until messages are due and return up to batch_size of them (None to exit)"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self._heap and (self._stopping or self._heap[0][0] <= now):
+                    break
+                if self._stopping:
+                    return None
+                timeout = self._heap[0][0] - now if self._heap else None
+                self._cond.wait(timeout)
+
+            # Give the batch a moment to fill up before calling the provider
+            if self.batch_wait and not self._stopping and len(self._heap) < self.batch_size:
+                self._cond.wait(self.batch_wait)
+
+            batch = []
+            now = time.monotonic()
+            while self._heap and len(batch) < self.batch_size and (self._stopping or self._heap[0][0] <= now):
+                sms = heapq.heappop(self._heap)[2]
+                if self._waiting.get(sms.phone) is sms:
+                    del self._waiting[sms.phone]
+                batch.append(sms)
+            self._in_flight += len(batch)
+            return batch
+
+    def _worker(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            if batch:
+                self._deliver(batch)
+
+    def _deliver(self, batch):
+        try:
+            results = self.transport.send_batch([(sms.phone, sms.message) for sms in batch])
+        except Exception as e:
+            logger.warning(f"SMS provider call for {len(batch)} message(s) failed: {e}")
+            results = [TransientSMSError(str(e))] * len(batch)
+
+        results = list(results)
+        if len(results) != len(batch):
+            # One result per message is the contract; retry the ones left unanswered
+            logger.warning(f"SMS transport returned {len(results)} result(s) for {len(batch)} message(s)")
+            missing = TransientSMSError('No result from the transport')
+            results = results[:len(batch)] + [missing] * (len(batch) - len(results))
+
+        now = time.monotonic()
+        with self._cond:
+            self.stats['batches'] += 1
+            self._in_flight -= len(batch)
+            for sms, result in zip(batch, results):
+                if result is True:
+                    self.stats['sent'] += 1
+                    self._recent[sms.phone] = (sms.message, now)
+                elif isinstance(result, Exception) and not self._stopping:
+                    self._retry(sms, now)
+                else:
+                    self.stats['failed'] += 1
+                    logger.error(f"Giving up on SMS to {sms.phone}")
+            self._prune_recent(now)
+            self._cond.notify_all()
+
+    def _retry(self, sms, now):
+        # Called with the lock held
+        sms.attempts += 1
+        if sms.attempts > self.max_retries:
+            self.stats['failed'] += 1
+            logger.error(f"Giving up on SMS to {sms.phone} after {sms.attempts} attempts")
+            return
+        if sms.phone in self._waiting:
+            # A newer message for this phone was queued meanwhile; it supersedes this one
+            self.stats['coalesced'] += 1
+            return
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (sms.attempts - 1))
+        self.stats['retried'] += 1
+        self._push(sms, now + delay * random.uniform(0.5, 1.0))
+
+    def _prune_recent(self, now):
+        # Called with the lock held
+        if len(self._recent) > self.max_queue:
+            self._recent = {phone: entry for phone, entry in self._recent.items()
+                            if now - entry[1] < self.coalesce_window}
+
+    def depth(self):
+        """Messages waiting or being sent"""
+        with self._cond:
+            return len(self._heap) + self._in_flight
+
+    def flush(self, timeout=SMS_SHUTDOWN_TIMEOUT):
+        """Wait until every queued message (including retries) has been handled"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._heap or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def shutdown(self, timeout=SMS_SHUTDOWN_TIMEOUT):
+        """Send what is queued right away (no more retries) and stop the workers"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            threads = list(self._threads)
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(0, deadline - time.monotonic()))
+        with self._cond:
+            if self._heap:
+                logger.warning(f"SMS queue shut down with {len(self._heap)} message(s) unsent")
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_sms_queue():
+    """The process wide outbound queue, drained on interpreter exit"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = SMSQueue(LoggingTransport())
+            atexit.register(lambda: _queue and _queue.shutdown())
+        return _queue
+
+
+def configure(transport, **options):
+    """Replace the outbound queue, e.g. configure(FakeTransport()) in tests"""
+    global _queue
+    with _queue_lock:
+        old, _queue = _queue, SMSQueue(transport, **options)
+    if old is not None:
+        old.shutdown()
+    else:
+        atexit.register(lambda: _queue and _queue.shutdown())
+    return _queue
+
+
 def send_otp_sms(phone, otp):
     """
     Send OTP via SMS.
-    
+
+    The message is queued and delivered in the background; returns False
+    only if the phone number is invalid or the queue is full.
+
     Args:
         phone (str): Phone number in +91 format
         otp (str): 6-digit OTP to send
     """
+    if not is_valid_phone(phone):
+        logger.error(f"Invalid phone number format: {phone}")
+        return False
     message = f"Your OTP for Lost and Found registration is: {otp}. Valid for 10 minutes."
-    return send_sms_via_email(phone, message)
+    try:
+        get_sms_queue().enqueue(phone, message)
+    except SMSQueueFull as e:
+        logger.error(f"Could not queue OTP SMS to {phone}: {e}")
+        return False
+    return True
 
 # For testing purposes
 if __name__ == "__main__":
-    # Test sending an OTP
-    send_otp_sms("+919876543210", "123456")
\ No newline at end of file
+    # Test sending an OTP through a flaky provider
+    sms_queue = configure(FakeTransport(fail_times=1), backoff_base=0.1)
+    send_otp_sms("+919876543210", "123456")
+    send_otp_sms("+919876543210", "654321")  # replaces the first one while it waits
+    send_otp_sms("+919876543211", "111111")
+    sms_queue.flush()
+    print(f"Delivered: {sms_queue.transport.sent}")
+    print(f"Stats: {sms_queue.stats}")